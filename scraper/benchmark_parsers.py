@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Parser backend benchmark for the Vatican scraper
+
+Times document extraction with every installed parser backend on real
+Vatican pages and reports pages parsed per second. Pages come from a WARC
+archive recorded with `vatican_scraper.py --record`, or are fetched live
+(politely) from the documents the Leo XIII index pages link to.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from vatican_scraper import (PARSER_BACKENDS, VaticanScraper, WarcReader,
+                             parse_document, parser_available)
+
+def load_archived_pages(path, limit):
+    """Read up to `limit` successfully archived pages from a WARC file"""
+    reader = WarcReader(path)
+    pages = []
+    for url in reader.index:
+        status, content = reader.get(url)
+        if status < 400:
+            pages.append((url, content))
+        if len(pages) >= limit:
+            break
+    return pages
+
+def fetch_live_pages(limit, delay):
+    """Fetch up to `limit` of the documents linked from the seed index pages"""
+    workdir = Path(tempfile.mkdtemp(prefix="parser_bench_"))
+    scraper = VaticanScraper(data_file=workdir / "documents.json", delay=delay)
+    pages = []
+    for url in scraper.find_pope_leo_pages()[:limit]:
+        content = scraper.fetch_content(url)
+        if content is not None:
+            pages.append((url, content))
+    return pages
+
+def benchmark(pages, backend, rounds):
+    """Return pages per second for extracting every page `rounds` times"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for url, content in pages:
+            parse_document(content, url, backend)
+    return len(pages) * rounds / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parser backends on Vatican pages")
+    parser.add_argument("--warc", help="Read pages from a WARC recorded with --record instead of fetching")
+    parser.add_argument("--pages", type=int, default=50,
+                       help="Number of pages to benchmark (default: 50)")
+    parser.add_argument("--rounds", type=int, default=3,
+                       help="Times to parse every page per backend (default: 3)")
+    parser.add_argument("--delay", type=float, default=1.0,
+                       help="Delay between live requests in seconds (default: 1.0)")
+
+    args = parser.parse_args()
+
+    pages = load_archived_pages(args.warc, args.pages) if args.warc else fetch_live_pages(args.pages, args.delay)
+    if not pages:
+        print("No pages to benchmark")
+        return
+    total_bytes = sum(len(content) for _, content in pages)
+    print(f"Benchmarking {len(pages)} pages ({total_bytes / 1024:.0f} KiB), {args.rounds} rounds each\n")
+
+    print(f"{'backend':<12} {'pages/s':>10} {'MiB/s':>8}")
+    for backend in PARSER_BACKENDS:
+        if not parser_available(backend):
+            print(f"{backend:<12} {'not installed':>19}")
+            continue
+        rate = benchmark(pages, backend, args.rounds)
+        mib_rate = rate * total_bytes / len(pages) / (1024 * 1024)
+        print(f"{backend:<12} {rate:>10.1f} {mib_rate:>8.2f}")
+
+if __name__ == "__main__":
+    main()
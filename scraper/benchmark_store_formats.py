@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Document store format benchmark for the Vatican scraper
+
+Writes a synthetic corpus in every snapshot format JsonStore supports and
+reports save time, load time and file size for each. Documents carry a
+body of generated prose so the sizes resemble a store with full text.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from vatican_scraper import (STORE_FORMATS, document_id, read_snapshot,
+                             store_format_missing, write_snapshot)
+
+WORDS = ("ecclesia fides caritas gratia veritas doctrina sacramentum populus "
+         "the church faith charity grace truth doctrine sacrament people of and "
+         "in to which that for with by is are be as this it his our all Christ "
+         "God Lord Holy Spirit encyclical apostolic letter brethren venerable").split()
+
+def synthetic_corpus(documents, text_kib, seed=0):
+    """A store's worth of plausible documents with about text_kib of body each"""
+    rng = random.Random(seed)
+    types = ["Encyclicals", "Apostolic Letters", "Speeches", "Letters", "Homilies"]
+    languages = ["English", "Latin", "Italian"]
+
+    def prose(length):
+        words = []
+        size = 0
+        while size < length:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)
+
+    docs = []
+    for i in range(documents):
+        doc_type = rng.choice(types)
+        slug = doc_type.lower().replace(" ", "-")
+        urls = [f"https://www.vatican.va/content/leo-xiii/{code}/{slug}/documents/hf_l-xiii_doc_{i:05d}.html"
+                for code in ("en", "la", "it")[:rng.randint(1, 3)]]
+        docs.append({
+            "id": document_id(urls[0]),
+            "title": f"{doc_type} {i}: {prose(40).title()}",
+            "url": urls[-1],
+            "urls": urls,
+            "type": doc_type,
+            "date": f"{rng.randint(1, 28)} May {rng.randint(1878, 1903)}",
+            "language": languages[len(urls) - 1],
+            "languages": languages[:len(urls)],
+            "description": prose(300),
+            "text": prose(text_kib * 1024),
+            "added_date": "2026-01-01T00:00:00",
+        })
+    return {"metadata": {"pope": "Leo XIII", "source": "vatican.va", "total_documents": documents},
+            "documents": docs}
+
+def benchmark(data, path, rounds):
+    """Best save and load times over `rounds` runs, and the file size"""
+    save_times = []
+    load_times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        with open(path, 'wb') as f:
+            write_snapshot(f, data, path)
+        save_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        loaded = read_snapshot(path)
+        load_times.append(time.perf_counter() - start)
+        assert len(loaded["documents"]) == len(data["documents"])
+    return min(save_times), min(load_times), os.path.getsize(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document store formats on a synthetic corpus")
+    parser.add_argument("--documents", type=int, default=5000,
+                       help="Number of synthetic documents (default: 5000)")
+    parser.add_argument("--text-kib", type=int, default=16,
+                       help="Body text per document in KiB (default: 16)")
+    parser.add_argument("--rounds", type=int, default=3,
+                       help="Times to save and load each format; the best is reported (default: 3)")
+
+    args = parser.parse_args()
+
+    data = synthetic_corpus(args.documents, args.text_kib)
+    workdir = Path(tempfile.mkdtemp(prefix="store_bench_"))
+    print(f"Benchmarking {args.documents} documents with {args.text_kib} KiB of text each, "
+          f"{args.rounds} rounds per format\n")
+
+    print(f"{'format':<14} {'save s':>8} {'load s':>8} {'size MiB':>9} {'ratio':>6}")
+    baseline = None
+    for suffix in STORE_FORMATS:
+        path = workdir / f"documents{suffix}"
+        missing = store_format_missing(path)
+        if missing:
+            print(f"{suffix:<14} {'needs ' + ', '.join(missing):>34}")
+            continue
+        save, load, size = benchmark(data, path, args.rounds)
+        baseline = baseline or size
+        print(f"{suffix:<14} {save:>8.2f} {load:>8.2f} {size / (1024 * 1024):>9.1f} {baseline / size:>6.1f}")
+        path.unlink()
+    workdir.rmdir()
+
+if __name__ == "__main__":
+    main()
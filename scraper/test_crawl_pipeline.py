@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for the crawl pipeline of the Vatican scraper
+
+Crawls a local http.server standing in for vatican.va with index pages
+and documents for two pontiffs.
+Run with: python -m unittest discover -s scraper
+"""
+
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from test_sitemap_discovery import StandInSite
+from vatican_scraper import BackgroundWriter, FetchLog, VaticanScraper
+
+POPES = ["leo-xiii", "pius-xii"]
+DOCUMENTS = 12
+
+def index_page(names):
+    links = ''.join(f'<li><a href="encyclicals/documents/{name}.html">{name}</a></li>' for name in names)
+    return f"<html><body><ul>{links}</ul></body></html>"
+
+def document_page(pope, name):
+    return (f"<html><body><h1>{pope} {name}</h1>"
+            f"<p>Given at Rome, at St. Peter's, the 15 May 1891. {'Filler text. ' * 10}</p></body></html>")
+
+class CrawlPipelineTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.site = StandInSite()
+        for pope in POPES:
+            names = [f"hf_enc_{i}" for i in range(DOCUMENTS)]
+            cls.site.pages[f"/content/{pope}/en/encyclicals.index.html"] = index_page(names).encode()
+            for name in names:
+                cls.site.pages[f"/content/{pope}/en/encyclicals/documents/{name}.html"] = \
+                    document_page(pope, name).encode()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.site.close()
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_per_pope_sqlite_crawl_saves_progress(self):
+        # flush_interval=0 saves progress after every result, off the event loop
+        spec = f"sqlite:{self.workdir.name}/popes/{{pope}}.db"
+        scraper = VaticanScraper(data_file=spec, delay=0, max_retries=0, flush_interval=0,
+                                 use_sitemaps=False, popes=POPES)
+        scraper.base_url = self.site.base
+        scraper.scrape_all_documents()
+        self.assertEqual(scraper._stats['new'], DOCUMENTS * len(POPES))
+        for pope in POPES:
+            with sqlite3.connect(Path(self.workdir.name) / "popes" / f"{pope}.db") as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0], DOCUMENTS)
+
+    def test_crawl_finishes_with_a_one_page_queue(self):
+        # Seeds wait for room in the page queue; workers queue links regardless
+        scraper = VaticanScraper(data_file=f"{self.workdir.name}/docs.json", delay=0, max_retries=0,
+                                 queue_size=1, concurrency=2, use_sitemaps=False, popes=POPES)
+        scraper.base_url = self.site.base
+        scraper.scrape_all_documents()
+        self.assertEqual(scraper._stats['new'], DOCUMENTS * len(POPES))
+
+class FlakyStore:
+    """Just enough of a DocumentStore for BackgroundWriter; the first write fails"""
+
+    def __init__(self):
+        self.metadata = {}
+        self.failures = 1
+        self.written = []
+
+    def _write_batch(self, docs, metadata, compact=False):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.written.extend(doc["id"] for doc in docs)
+
+    def _written(self, docs):
+        pass
+
+class BackgroundWriterTest(unittest.TestCase):
+
+    def test_failed_batch_is_retried(self):
+        store = FlakyStore()
+        writer = BackgroundWriter(store, max_interval=60)
+        writer.submit({"id": "a"})
+        with self.assertRaises(OSError):
+            writer.flush()
+        self.assertEqual(store.written, [])
+        writer.submit({"id": "b"})
+        writer.flush()
+        self.assertEqual(sorted(store.written), ["a", "b"])
+        writer.close()
+
+class FetchLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.workdir.name) / "docs.fetched.jsonl"
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_saves_append_and_replay(self):
+        log = FetchLog(self.path)
+        log.record("https://www.vatican.va/a.html", "Encyclical", 100.0)
+        log.save()
+        log.record("https://www.vatican.va/b.html", "Letter", 200.0)
+        log.save(log.take())
+        log.record("https://www.vatican.va/a.html", "Encyclical", 300.0)
+        log.save()
+        self.assertEqual(len(self.path.read_text().splitlines()), 3)
+        replayed = FetchLog(self.path)
+        self.assertEqual(replayed.entries, log.entries)
+        self.assertEqual(replayed.entries["https://www.vatican.va/a.html"]["fetched"], 300.0)
+
+    def test_overgrown_log_is_compacted(self):
+        log = FetchLog(self.path)
+        log.COMPACT_MIN_LINES = 4
+        for fetched in range(5):
+            log.record("https://www.vatican.va/a.html", "Encyclical", float(fetched + 1))
+            log.save()
+        log.save()
+        self.assertEqual(len(self.path.read_text().splitlines()), 1)
+        self.assertEqual(FetchLog(self.path).entries, log.entries)
+
+    def test_whole_json_log_is_carried_over(self):
+        legacy = self.path.with_suffix(".json")
+        legacy.write_text(json.dumps({"https://www.vatican.va/a.html": {"type": "Speech", "fetched": 5.0}}))
+        log = FetchLog(self.path)
+        self.assertEqual(log.entries["https://www.vatican.va/a.html"]["fetched"], 5.0)
+        log.save()
+        self.assertFalse(legacy.exists())
+        self.assertEqual(FetchLog(self.path).entries, log.entries)
+
+if __name__ == "__main__":
+    unittest.main()
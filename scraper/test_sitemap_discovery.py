@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for robots.txt and sitemap discovery in the Vatican scraper
+
+A local http.server stands in for vatican.va, serving robots.txt with a
+Crawl-delay and a Disallow rule, a sitemap index and gzipped sitemaps.
+Run with: python -m unittest discover -s scraper
+"""
+
+import gzip
+import http.server
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from vatican_scraper import FetchLog, VaticanScraper, parse_lastmod
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+def sitemap_index(base, names):
+    entries = ''.join(f'<sitemap><loc>{base}/{name}</loc></sitemap>' for name in names)
+    return f'<?xml version="1.0"?><sitemapindex xmlns="{SITEMAP_NS}">{entries}</sitemapindex>'
+
+def urlset(urls):
+    """urls is a list of (loc, lastmod or None)"""
+    entries = ''.join(f'<url><loc>{loc}</loc>' + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + '</url>'
+                      for loc, lastmod in urls)
+    return f'<?xml version="1.0"?><urlset xmlns="{SITEMAP_NS}">{entries}</urlset>'
+
+class StandInSite:
+    """A local stand-in for vatican.va, serving whatever `pages` holds"""
+
+    def __init__(self):
+        self.pages = {}  # path -> bytes
+        self.requested = []
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                site.requested.append(self.path)
+                body = site.pages.get(self.path)
+                self.send_response(200 if body is not None else 404)
+                self.send_header('Content-Length', str(len(body or b'')))
+                self.end_headers()
+                self.wfile.write(body or b'')
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.host = f"127.0.0.1:{self.server.server_address[1]}"
+        self.base = f"http://{self.host}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class SitemapDiscoveryTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.site = StandInSite()
+        base = cls.site.base
+        leo = f"{base}/content/leo-xiii/en"
+        cls.dated = f"{leo}/encyclicals/documents/hf_l-xiii_enc_15051891_rerum-novarum.html"
+        cls.undated = f"{leo}/letters/documents/hf_l-xiii_let_1.html"
+        cls.site.pages = {
+            '/robots.txt': (f"User-agent: *\nCrawl-delay: 2\nDisallow: /private/\n"
+                            f"Sitemap: {base}/sitemap_index.xml\n").encode(),
+            '/sitemap_index.xml': sitemap_index(base, ["sitemap_leo-xiii.xml.gz",
+                                                       "sitemap_pius-xii.xml"]).encode(),
+            '/sitemap_leo-xiii.xml.gz': gzip.compress(urlset([
+                (cls.dated, "2020-01-02"),
+                (cls.undated + "#top", None),
+                (f"{leo}/encyclicals.index.html", "2020-01-02"),  # Navigation
+                (f"{base}/content/pius-xii/en/encyclicals/documents/hf_p-xii_enc_1.html", None),
+                (f"{base}/content/news/en.html", None),
+            ]).encode()),
+            '/sitemap_pius-xii.xml': urlset([
+                (f"{base}/content/pius-xii/en/letters/documents/hf_p-xii_let_1.html", "2021-03-04T10:00:00Z"),
+            ]).encode(),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.site.close()
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.site.requested.clear()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    @property
+    def sitemap_index(self):
+        # Read directly rather than through robots.txt, whose Crawl-delay would pace the test
+        return f"{self.site.base}/sitemap_index.xml"
+
+    def scraper(self, **options):
+        options.setdefault('delay', 0)
+        scraper = VaticanScraper(data_file=Path(self.workdir.name) / "documents.json",
+                                 max_retries=0, **options)
+        scraper.base_url = self.site.base
+        return scraper
+
+    def test_crawl_delay_sets_host_rate(self):
+        scraper = self.scraper()
+        with mock.patch.object(scraper.rate_limiter, 'set_host_rate',
+                               wraps=scraper.rate_limiter.set_host_rate) as set_host_rate:
+            sitemaps = scraper.read_robots()
+        self.assertEqual(sitemaps, [f"{self.site.base}/sitemap_index.xml"])
+        set_host_rate.assert_called_once_with(self.site.host, 0.5)
+
+    def test_slower_delay_is_kept(self):
+        scraper = self.scraper(delay=5)  # 0.2 requests per second beats Crawl-delay: 2
+        with mock.patch.object(scraper.rate_limiter, 'set_host_rate') as set_host_rate:
+            scraper.read_robots()
+        set_host_rate.assert_not_called()
+
+    def test_allowed_follows_disallow(self):
+        scraper = self.scraper()
+        private = f"{self.site.base}/private/page.html"
+        self.assertTrue(scraper.allowed(private))  # Nothing is known before robots.txt is read
+        scraper.read_robots()
+        self.assertFalse(scraper.allowed(private))
+        self.assertTrue(scraper.allowed(self.dated))
+
+    def test_missing_robots_allows_everything(self):
+        pages = self.site.pages
+        self.site.pages = {}
+        try:
+            scraper = self.scraper()
+            self.assertEqual(scraper.read_robots(), [])
+            self.assertTrue(scraper.allowed(f"{self.site.base}/private/page.html"))
+            self.assertEqual(scraper.dead_letters.entries, {})
+        finally:
+            self.site.pages = pages
+
+    def test_sitemaps_are_nested_and_filtered_by_pope(self):
+        scraper = self.scraper()
+        pages = scraper.find_sitemap_pages([self.sitemap_index])
+        self.assertEqual(set(pages), {self.dated, self.undated})
+        self.assertIn('/sitemap_leo-xiii.xml.gz', self.site.requested)
+        self.assertNotIn('/sitemap_pius-xii.xml', self.site.requested)
+
+    def test_every_pope_crawled_has_his_sitemap_read(self):
+        scraper = self.scraper(popes=["leo-xiii", "pius-xii"])
+        pages = scraper.find_sitemap_pages([self.sitemap_index])
+        self.assertEqual(len(pages), 4)  # The Leo XIII sitemap also lists a Pius XII page
+        self.assertIn('/sitemap_pius-xii.xml', self.site.requested)
+
+    def test_popes_without_sitemap_pages_are_seeded(self):
+        scraper = self.scraper(popes=["leo-xiii", "pius-xi"], sitemap_urls=[self.sitemap_index])
+        crawled = {}
+        async def crawl(seed_urls, document_urls, done):
+            crawled.update(seeds=seed_urls, documents=document_urls)
+        with mock.patch.object(scraper, '_crawl_async', crawl):
+            scraper.scrape_all_documents()
+        self.assertEqual(crawled['seeds'], scraper.seed_urls(["pius-xi"]))
+        self.assertEqual(set(crawled['documents']), {self.dated, self.undated})
+
+    def test_lastmod_is_kept_per_page(self):
+        scraper = self.scraper()
+        pages = scraper.find_sitemap_pages([self.sitemap_index])
+        self.assertEqual(pages[self.dated], parse_lastmod("2020-01-02"))
+        self.assertEqual(pages[self.dated], 1577923200.0)
+        self.assertIsNone(pages[self.undated])
+
+    def test_lastmod_decides_refetching(self):
+        log = FetchLog(Path(self.workdir.name) / "fetched.json")
+        log.record(self.dated, "Encyclical")
+        fetched = log.entries[self.dated]["fetched"]
+        self.assertTrue(log.is_fresh(self.dated, fetched - 60))  # Changed before we fetched it
+        self.assertFalse(log.is_fresh(self.dated, fetched + 60))  # Changed since
+        self.assertFalse(log.is_fresh(self.undated, fetched - 60))  # Never fetched
+
+if __name__ == "__main__":
+    unittest.main()
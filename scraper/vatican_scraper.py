@@ -3,310 +3,3629 @@
 Vatican Website Scraper for Pope Leo's Magisterial Acts
 
 This script crawls the Vatican website to collect all of Pope Leo's writings,
-speeches, and other magisterial documents, storing them in a JSON format
-that supports read status, comments, and quotes.
+speeches, and other magisterial documents, or those of any other modern pope,
+storing them in a JSON format, with read status, comments, and quotes kept in
+a separate annotation file.
 """
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import importlib.util
+import io
 import json
+import os
+import queue
+import random
+import threading
 import time
+import uuid
 import re
-from urllib.parse import urljoin, urlparse
-from datetime import datetime
+import sqlite3
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import argparse
+import codecs
+from html.parser import HTMLParser
 from pathlib import Path
 
+class RateLimiter:
+    """Per-host token bucket shared by every fetch worker.
+    
+    Each host holds up to `burst` tokens that refill at `rate` per second.
+    A caller reserves a token under the lock and then sleeps outside it, so
+    the same limiter serves threads (acquire) and coroutines (acquire_async)
+    and waiting workers queue fairly instead of spinning.
+    """
+    
+    def __init__(self, rate, burst=1):
+        self.rate = rate  # Sustained requests per second per host; falsy = unlimited
+        self.burst = max(1, burst)
+        self._host_rates = {}
+        self._buckets = {}  # host -> (tokens, last refill time)
+        self._lock = threading.Lock()
+        
+        # Queueing statistics
+        self.requests = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def set_host_rate(self, host, rate):
+        """Override the sustained rate for a single host"""
+        with self._lock:
+            self._host_rates[host] = rate
+    
+    def _reserve(self, url):
+        """Take a token for the url's host, returning the seconds to wait for it"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            self.requests += 1
+            rate = self._host_rates.get(host, self.rate)
+            if not rate:
+                return 0.0
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * rate) - 1
+            self._buckets[host] = (tokens, now)
+            # A negative balance is a reservation against future refills
+            wait = -tokens / rate if tokens < 0 else 0.0
+            if wait:
+                self.waited += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+    
+    def acquire(self, url):
+        """Block the calling thread until a request to url may start"""
+        wait = self._reserve(url)
+        if wait:
+            time.sleep(wait)
+        return wait
+    
+    async def acquire_async(self, url):
+        """Suspend the calling coroutine until a request to url may start"""
+        wait = self._reserve(url)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+    
+    def summary(self):
+        """One-line report of how long requests spent queued"""
+        avg = self.total_wait / self.requests if self.requests else 0.0
+        return (f"Rate limiter: {self.requests} requests, {self.waited} queued, "
+                f"{self.total_wait:.1f}s total wait, {avg:.2f}s avg, {self.max_wait:.2f}s max")
+
+class HttpCache:
+    """Size-bounded on-disk cache of page bodies and their validators.
+    
+    Each body is zlib-compressed into its own file named by a hash of the
+    canonical URL. index.json keeps the ETag / Last-Modified validators,
+    sizes and last-use times, which drive conditional requests and LRU
+    eviction once the compressed bodies exceed `max_bytes`.
+    """
+    
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.directory / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = self._load_index()
+        self._total_bytes = sum(e["size"] for e in self._entries.values())
+        with self._lock:
+            self._evict()  # Honour a limit lowered since the last run
+        
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+    
+    def _load_index(self):
+        """Load the cache index, dropping entries whose body file is gone"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return {key: entry for key, entry in entries.items()
+                if self._body_path(key).exists()}
+    
+    def _key(self, url):
+        return hashlib.sha256(canonical_url(url).encode('utf-8')).hexdigest()
+    
+    def _body_path(self, key):
+        return self.directory / key[:2] / f"{key}.z"
+    
+    def conditional_headers(self, url):
+        """Validator headers to send so an unchanged page comes back as a 304"""
+        with self._lock:
+            entry = self._entries.get(self._key(url))
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers['If-None-Match'] = entry["etag"]
+            if entry.get("last_modified"):
+                headers['If-Modified-Since'] = entry["last_modified"]
+        return headers
+    
+    def get(self, url):
+        """Return the cached body for url, or None if it isn't cached"""
+        key = self._key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            entry["used"] = time.time()
+        try:
+            return zlib.decompress(self._body_path(key).read_bytes())
+        except (OSError, zlib.error):
+            with self._lock:
+                self._forget(key)
+            return None
+    
+    def not_modified(self, url):
+        """Serve a 304 response from the cache, counting it as a hit"""
+        body = self.get(url)
+        if body is not None:
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += len(body)
+        return body
+    
+    def put(self, url, body, headers):
+        """Store a freshly downloaded body along with its validators"""
+        key = self._key(url)
+        compressed = zlib.compress(body, 6)
+        path = self._body_path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(compressed)
+        os.replace(tmp, path)
+        
+        with self._lock:
+            self.misses += 1
+            self._forget(key, remove_file=False)
+            self._entries[key] = {
+                "url": url,
+                "etag": headers.get('ETag'),
+                "last_modified": headers.get('Last-Modified'),
+                "size": len(compressed),
+                "used": time.time(),
+            }
+            self._total_bytes += len(compressed)
+            self._evict()
+    
+    def _forget(self, key, remove_file=True):
+        """Drop an entry from the index (caller holds the lock)"""
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._total_bytes -= entry["size"]
+            if remove_file:
+                try:
+                    self._body_path(key).unlink()
+                except OSError:
+                    pass
+    
+    def _evict(self):
+        """Remove least recently used bodies until under max_bytes (caller holds the lock)"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["used"]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._forget(key)
+    
+    def save(self):
+        """Persist the index so validators survive between runs"""
+        with self._lock:
+            data = json.dumps(self._entries)
+        tmp = self.index_file.with_suffix(".tmp")
+        tmp.write_text(data, encoding='utf-8')
+        os.replace(tmp, self.index_file)
+    
+    def summary(self):
+        """One-line report of cache effectiveness"""
+        return (f"HTTP cache: {self.hits} hits, {self.misses} misses, "
+                f"{self.bytes_saved / 1024:.0f} KiB not re-downloaded, "
+                f"{len(self._entries)} entries / {self._total_bytes / 1024:.0f} KiB on disk")
+
+class CircuitBreaker:
+    """Per-host circuit breaker.
+    
+    After `threshold` consecutive failures a host is opened for `cooldown`
+    seconds, and every worker pauses before sending it anything more. The
+    first request after the pause is a trial. If it succeeds the breaker
+    closes; if it fails the host is paused again.
+    """
+    
+    def __init__(self, threshold=5, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = {}  # host -> consecutive failures
+        self._open_until = {}  # host -> monotonic time the pause ends
+        self._lock = threading.Lock()
+    
+    def wait_time(self, url):
+        """Seconds until the url's host may be contacted again"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            return max(0.0, self._open_until.get(host, 0.0) - time.monotonic())
+    
+    def record_success(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            self._failures.pop(host, None)
+            self._open_until.pop(host, None)
+    
+    def record_failure(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures >= self.threshold and self._open_until.get(host, 0.0) <= time.monotonic():
+                self._open_until[host] = time.monotonic() + self.cooldown
+                print(f"Circuit open for {host} after {failures} failures; "
+                      f"pausing it for {self.cooldown:.0f}s")
+
+class DeadLetterList:
+    """URLs that still failed after every retry, kept on disk so a later
+    run can retry just those"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading dead-letter list: {e}")
+    
+    def add(self, url, error, kind="document"):
+        with self._lock:
+            entry = self.entries.setdefault(url, {"kind": kind, "failures": 0})
+            entry["failures"] += 1
+            entry["error"] = str(error)
+            entry["last_failed"] = datetime.now().isoformat()
+    
+    def discard(self, url):
+        with self._lock:
+            self.entries.pop(url, None)
+    
+    def urls(self, kind=None):
+        with self._lock:
+            return [url for url, entry in self.entries.items()
+                    if kind is None or entry["kind"] == kind]
+    
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.entries, indent=2, ensure_ascii=False)
+        if data == "{}" and not self.path.exists():
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(data, encoding='utf-8')
+        os.replace(tmp, self.path)
+
+# Days a fetched page stays fresh in --incremental runs, by document type.
+# "index" is for navigation pages; "default" covers every other type.
+FRESHNESS_DAYS = {"index": 1, "Encyclical": 365, "Apostolic Letter": 365,
+                  "Letter": 90, "Speech": 90, "default": 30}
+
+class FetchLog:
+    """When each page was last fetched successfully and as what type, kept
+    on disk so an --incremental run can skip pages that are still fresh.
+    
+    Pages are keyed by canonical URL. A page is fresh while it is younger
+    than the TTL in `days` for its type, or, when the site says when it
+    last changed (a sitemap's lastmod), if it was fetched since.
+    
+    Fetches are buffered and appended to a JSON-lines log by save(); loading
+    replays the log, the last fetch of a URL winning, and a log that has
+    grown well past one line per URL is rewritten. Only recorded from the
+    event loop; fetches taken with take() may be saved from another thread.
+    """
+    
+    COMPACT_MIN_LINES = 1000
+    
+    def __init__(self, path, days=None):
+        self.path = Path(path)
+        self.days = dict(FRESHNESS_DAYS, **(days or {}))
+        self.entries = {}
+        self._buffer = []
+        self._lines = 0  # Lines in the log on disk
+        # A whole-JSON log from before the log was append-only
+        self._legacy = self.path.with_suffix(".json")
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            break  # A torn final line from an interrupted save
+                        self.entries[entry.pop("url")] = entry
+                        self._lines += 1
+            elif self._legacy != self.path and self._legacy.exists():
+                with open(self._legacy, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+                # Carried over by the first save
+                self._buffer = [dict(entry, url=url) for url, entry in self.entries.items()]
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading fetch log: {e}")
+    
+    def record(self, url, doc_type, fetched=None):
+        entry = {"type": doc_type, "fetched": fetched or time.time()}
+        self.entries[canonical_url(url)] = entry
+        self._buffer.append(dict(entry, url=canonical_url(url)))
+    
+    def is_fresh(self, url, modified=None):
+        entry = self.entries.get(canonical_url(url))
+        if entry is None:
+            return False
+        if modified is not None:
+            return entry["fetched"] >= modified
+        days = self.days.get(entry["type"], self.days["default"])
+        return time.time() - entry["fetched"] < days * 86400
+    
+    def take(self):
+        """The buffered fetches, no longer buffered"""
+        buffer, self._buffer = self._buffer, []
+        return buffer
+    
+    def save(self, entries=None):
+        """Append buffered fetches, or fetches taken earlier, to the log.
+        
+        Without entries it runs where fetches are recorded, so it may also
+        rewrite an overgrown log from self.entries.
+        """
+        if entries is None:
+            entries = self.take()
+            if self._lines > max(2 * len(self.entries), self.COMPACT_MIN_LINES):
+                self._compact()
+                return
+        if not entries:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        self._lines += len(entries)
+        self._forget_legacy()
+    
+    def _compact(self):
+        """Rewrite the log with one line per URL"""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("".join(json.dumps(dict(entry, url=url), ensure_ascii=False) + "\n"
+                               for url, entry in self.entries.items()), encoding='utf-8')
+        os.replace(tmp, self.path)
+        self._lines = len(self.entries)
+        self._forget_legacy()
+    
+    def _forget_legacy(self):
+        """Remove the old whole-JSON log once the new one holds its entries"""
+        if self._legacy and self._legacy != self.path and self._legacy.exists():
+            self._legacy.unlink()
+        self._legacy = None
+
+class CrawlFrontier:
+    """Every URL a crawl has queued and how far it got, kept on disk so an
+    interrupted crawl can pick up where it stopped.
+    
+    Each URL is pending, in-flight, done or failed, separately as an index
+    page and as a document, since some pages are both. State changes are
+    buffered and appended to a JSON-lines log by flush(); load() replays the
+    log, the last state of a URL winning. A URL that was in flight when the
+    crawl stopped counts as pending again. Only changed from the event loop;
+    changes taken with take() may be flushed from another thread.
+    """
+    
+    PENDING, IN_FLIGHT, DONE, FAILED = 'pending', 'in-flight', 'done', 'failed'
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}  # (kind, url) -> state
+        self.depths = {}  # (kind, url) -> link hops from the seed pages
+        self._buffer = []
+    
+    def load(self):
+        """Replay the log of an unfinished crawl; False if there is none"""
+        self.entries = {}
+        if not self.path.exists():
+            return False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A torn final line from an interrupted flush
+                self.entries[entry["kind"], entry["url"]] = entry["state"]
+                if "depth" in entry:
+                    self.depths[entry["kind"], entry["url"]] = entry["depth"]
+        for key, state in self.entries.items():
+            if state == self.IN_FLIGHT:
+                self.entries[key] = self.PENDING
+        return True
+    
+    def reset(self):
+        """Forget any earlier crawl"""
+        self.entries = {}
+        self.depths = {}
+        self._buffer = []
+        if self.path.exists():
+            self.path.unlink()
+    
+    def add(self, url, kind, depth=0):
+        """Record a newly queued URL as pending"""
+        if (kind, url) not in self.entries:
+            self.entries[kind, url] = self.PENDING
+            self.depths[kind, url] = depth
+            self._buffer.append({"url": url, "kind": kind, "state": self.PENDING, "depth": depth})
+    
+    def mark(self, url, kind, state):
+        self.entries[kind, url] = state
+        self._buffer.append({"url": url, "kind": kind, "state": state})
+    
+    def depth(self, url, kind):
+        return self.depths.get((kind, url), 0)
+    
+    def urls(self, kind, *states):
+        return [url for (url_kind, url), state in self.entries.items()
+                if url_kind == kind and state in states]
+    
+    def take(self):
+        """The buffered state changes, no longer buffered"""
+        buffer, self._buffer = self._buffer, []
+        return buffer
+    
+    def flush(self, entries=None):
+        """Append buffered state changes, or entries taken earlier, to the log"""
+        entries = self.take() if entries is None else entries
+        if not entries:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def finish(self):
+        """The crawl completed; nothing is left to resume"""
+        self.reset()
+
+class WarcWriter:
+    """Append-only WARC 1.0 archive of every response fetch_content receives.
+    
+    Each record is written as its own gzip member (for .gz paths), so the
+    file is a valid .warc.gz after every append and a killed run loses at
+    most the record in progress. Bodies are stored as requests decoded
+    them, so Content-Encoding and Transfer-Encoding are dropped from the
+    recorded HTTP headers.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.compress = self.path.suffix == '.gz'
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'ab')
+        self.records = 0
+        if self._file.tell() == 0:
+            info = (f"software: vatican_scraper\r\nformat: WARC File Format 1.0\r\n"
+                    f"created: {datetime.now(timezone.utc).isoformat()}\r\n").encode('utf-8')
+            self._write("warcinfo", None, "application/warc-fields", info)
+    
+    def _write(self, warc_type, url, content_type, block, payload=None):
+        headers = [
+            "WARC/1.0",
+            f"WARC-Type: {warc_type}",
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+            f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        ]
+        if url:
+            headers.append(f"WARC-Target-URI: {url}")
+        if payload is not None:
+            digest = base64.b32encode(hashlib.sha1(payload).digest()).decode('ascii')
+            headers.append(f"WARC-Payload-Digest: sha1:{digest}")
+        headers += [f"Content-Type: {content_type}", f"Content-Length: {len(block)}"]
+        record = ("\r\n".join(headers) + "\r\n\r\n").encode('utf-8') + block + b"\r\n\r\n"
+        if self.compress:
+            record = gzip.compress(record, 6)
+        with self._lock:
+            self._file.write(record)
+            self._file.flush()
+            self.records += 1
+    
+    def record_response(self, url, response):
+        """Append a network response, status line and headers included"""
+        raw = getattr(response, 'raw', None)
+        version = {10: "HTTP/1.0", 11: "HTTP/1.1"}.get(getattr(raw, 'version', 11), "HTTP/1.1")
+        lines = [f"{version} {response.status_code} {response.reason or ''}".rstrip()]
+        for name, value in response.headers.items():
+            if name.lower() in ('content-encoding', 'transfer-encoding', 'content-length'):
+                continue
+            lines.append(f"{name}: {value}")
+        lines.append(f"Content-Length: {len(response.content)}")
+        block = ("\r\n".join(lines) + "\r\n\r\n").encode('iso-8859-1', 'replace') + response.content
+        self._write("response", url, "application/http; msgtype=response", block, response.content)
+    
+    def record_resource(self, url, body):
+        """Append a body that was served locally, e.g. from the cache on a 304"""
+        self._write("resource", url, "text/html", body, body)
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class WarcReader:
+    """Offline stand-in for the network built from a WarcWriter archive.
+    
+    The archive is scanned once to index the byte offset of the latest
+    response or resource record for every URL. Bodies are read back by
+    offset on demand, so memory stays flat however large the archive is.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.compressed = f.read(2) == b'\x1f\x8b'
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'rb')
+        self.index = {}
+        for offset, headers, _ in self._records():
+            if headers.get('warc-type') in ('response', 'resource'):
+                self.index[canonical_url(headers['warc-target-uri'])] = offset
+    
+    def _records(self):
+        """Yield (offset, WARC headers, block) for every record in order"""
+        with open(self.path, 'rb') as f:
+            if not self.compressed:
+                while True:
+                    offset = f.tell()
+                    record = self._parse_record(f)
+                    if record is None:
+                        return
+                    yield (offset,) + record
+            offset, pending = 0, b''
+            while True:
+                inflater = zlib.decompressobj(wbits=31)
+                start, parts = offset, []
+                while not inflater.eof:
+                    chunk = pending or f.read(1 << 16)
+                    if not chunk:
+                        return  # Clean end, or a truncated final record
+                    parts.append(inflater.decompress(chunk))
+                    pending = inflater.unused_data
+                    offset += len(chunk) - len(pending)
+                record = self._parse_record(io.BytesIO(b''.join(parts)))
+                if record is not None:
+                    yield (start,) + record
+    
+    @staticmethod
+    def _parse_record(f):
+        """Read one uncompressed record from f, or None at end of file"""
+        line = f.readline()
+        while line in (b'\r\n', b'\n'):
+            line = f.readline()
+        if not line.startswith(b'WARC/'):
+            return None
+        headers = {}
+        for line in iter(f.readline, b''):
+            if not line.strip():
+                break
+            name, _, value = line.decode('utf-8').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        block = f.read(int(headers.get('content-length', 0)))
+        return headers, block
+    
+    def get(self, url):
+        """Return (status, body) for the latest record of url, or None"""
+        offset = self.index.get(canonical_url(url))
+        if offset is None:
+            return None
+        with self._lock:
+            self._file.seek(offset)
+            if self.compressed:
+                inflater = zlib.decompressobj(wbits=31)
+                data = b''
+                while not inflater.eof:
+                    chunk = self._file.read(1 << 16)
+                    if not chunk:
+                        break
+                    data += inflater.decompress(chunk)
+                headers, block = self._parse_record(io.BytesIO(data))
+            else:
+                headers, block = self._parse_record(self._file)
+        if headers.get('warc-type') == 'resource':
+            return 200, block
+        head, _, body = block.partition(b'\r\n\r\n')
+        status = int(head.split(b' ', 2)[1])
+        return status, body
+
+# Parser backends, fastest first; BeautifulSoup's own html.parser always works
+PARSER_BACKENDS = ['selectolax', 'lxml', 'html5lib', 'html.parser']
+_BACKEND_MODULES = {'selectolax': 'selectolax', 'lxml': 'lxml', 'html5lib': 'html5lib'}
+
+def parser_available(backend):
+    """Whether the library behind a parser backend is installed"""
+    module = _BACKEND_MODULES.get(backend)
+    return module is None or importlib.util.find_spec(module) is not None
+
+def resolve_parser(backend):
+    """Return backend if usable, else the fastest installed fallback"""
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend!r}; choose from {', '.join(PARSER_BACKENDS)}")
+    if parser_available(backend):
+        return backend
+    fallback = next(b for b in ['lxml', 'html.parser'] if parser_available(b))
+    print(f"Parser backend {backend!r} is not installed; using {fallback!r}")
+    return fallback
+
+class SelectolaxDocument:
+    """A selectolax tree, walked by iter_page_events like a BeautifulSoup one"""
+    
+    def __init__(self, content):
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:
+            from selectolax.parser import HTMLParser
+        self.tree = HTMLParser(content)
+    
+    def iter_events(self):
+        """Yield the same (event, value, classes) stream as iter_page_events"""
+        root = self.tree.root
+        if root is None:
+            return
+        yield _START, root.tag, _classes(root.attributes.get('class'))
+        stack = [root.iter(include_text=True)]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                yield _END, None, None
+            elif node.is_text_node:
+                yield _TEXT, node.text_content, None
+            elif not node.is_comment_node:
+                yield _START, node.tag, _classes(node.attributes.get('class'))
+                stack.append(node.iter(include_text=True))
+
+_START, _END, _TEXT = range(3)
+
+def _classes(value):
+    """Normalize a class attribute to a tuple of class names"""
+    if not value:
+        return ()
+    return tuple(value.split()) if isinstance(value, str) else tuple(value)
+
+def iter_page_events(tree):
+    """Walk a parsed page once in document order, backend independently.
+    
+    Yields (_START, tag name, classes), (_TEXT, string, None) and
+    (_END, None, None) tuples. Comments and other non-text strings are
+    skipped, as they are by BeautifulSoup's get_text().
+    """
+    if isinstance(tree, SelectolaxDocument):
+        yield from tree.iter_events()
+        return
+    stack = [iter(tree.contents)]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            if stack:
+                yield _END, None, None
+        elif isinstance(node, Tag):
+            yield _START, node.name, _classes(node.get('class'))
+            stack.append(iter(node.contents))
+        elif type(node) in (NavigableString, CData):
+            yield _TEXT, str(node), None
+
+def parse_html(content, backend='html.parser'):
+    """Build the parse tree for a page's raw bytes with the given backend"""
+    if backend == 'selectolax':
+        return SelectolaxDocument(content)
+    return BeautifulSoup(content, backend)
+
+# The modern pontiffs by their vatican.va path segment, oldest first
+POPES = {
+    "leo-xiii": "Leo XIII",
+    "pius-x": "Pius X",
+    "benedict-xv": "Benedict XV",
+    "pius-xi": "Pius XI",
+    "pius-xii": "Pius XII",
+    "john-xxiii": "John XXIII",
+    "paul-vi": "Paul VI",
+    "john-paul-i": "John Paul I",
+    "john-paul-ii": "John Paul II",
+    "benedict-xvi": "Benedict XVI",
+    "francesco": "Francis",
+    "leo-xiv": "Leo XIV",
+}
+# Older pages spell the segment with underscores, e.g. /holy_father/leo_xiii/
+_POPE_SPELLINGS = {pope.replace('-', '_'): pope for pope in POPES}
+
+def _fold_pope_spellings(path):
+    return '/'.join(_POPE_SPELLINGS.get(segment, segment) for segment in path.split('/'))
+
+def pope_of(url):
+    """The POPES key of the pontiff whose pages url is among, or None"""
+    for segment in urlparse(url).path.split('/'):
+        segment = _POPE_SPELLINGS.get(segment, segment)
+        if segment in POPES:
+            return segment
+    return None
+
+def names_pope(text, popes):
+    """Whether text, such as a sitemap URL, names one of popes"""
+    text = text.lower().replace('_', '-')
+    return any(re.search(rf'(?<![a-z]){re.escape(pope)}(?![a-z])', text) for pope in popes)
+
+# Hosts that serve every page over https, so an http link is the same page
+_HTTPS_HOSTS = {'www.vatican.va', 'vatican.va'}
+_REPEATED_SLASHES_RE = re.compile(r'/{2,}')
+
+def canonical_url(url):
+    """The one spelling of a page's URL that identifies it everywhere.
+    
+    Crawl discovery, the HTTP cache, WARC replay and the document stores'
+    URL indexes all key pages by this form, so links that differ only by
+    fragment, query string, http versus https, leo_xiii versus leo-xiii,
+    host case or doubled slashes are fetched, cached and stored once.
+    vatican.va's pages are static and ignore query strings, so those are
+    dropped there; on other hosts a query may pick the resource and is kept.
+    """
+    parts = urlparse(url)
+    netloc = parts.netloc.lower()
+    ours = netloc in _HTTPS_HOSTS
+    scheme = 'https' if ours else parts.scheme.lower()
+    path = _fold_pope_spellings(_REPEATED_SLASHES_RE.sub('/', parts.path or '/'))
+    return urlunparse((scheme, netloc, path, '', '' if ours else parts.query, ''))
+
+def is_document_link(full_url, page_url):
+    """Whether an absolute link found on page_url is a page of one of the POPES"""
+    return (pope_of(full_url) is not None and 
+            urlparse(full_url).path.endswith('.html') and
+            '/index.html' not in full_url and
+            canonical_url(full_url) != canonical_url(page_url))
+
+# Section indexes, their sub-pages and year pages, and a pope's home page
+# in each language. Every other page is_document_link accepts is a document.
+_NAVIGATION_PAGE_RE = re.compile(r'/(?:[^/]+\.index(?:\.[^/]+)?|[a-z]{2})\.html$')
+
+def is_navigation_page(url):
+    """Whether a pontiff's page lists other pages rather than being a document"""
+    return bool(_NAVIGATION_PAGE_RE.search(urlparse(url).path))
+
+# Document types by their vatican.va section segment
+DOCUMENT_TYPES = {
+    "encyclicals": "Encyclical",
+    "letters": "Letter",
+    "speeches": "Speech",
+    "apost_letters": "Apostolic Letter",
+    "apost_exhortations": "Apostolic Exhortation",
+    "apost_constitutions": "Apostolic Constitution",
+    "motu_proprio": "Motu Proprio",
+    "homilies": "Homily",
+    "audiences": "General Audience",
+    "angelus": "Angelus",
+    "messages": "Message",
+    "bulls": "Bull",
+    "briefs": "Brief",
+    "prayers": "Prayer",
+    "travels": "Apostolic Journey",
+}
+
+# Languages by their vatican.va path segment
+LANGUAGES = {
+    "la": "Latin",
+    "en": "English",
+    "it": "Italian",
+    "fr": "French",
+    "de": "German",
+    "es": "Spanish",
+    "pt": "Portuguese",
+    "pl": "Polish",
+    "ar": "Arabic",
+    "hu": "Hungarian",
+    "nl": "Dutch",
+    "ru": "Russian",
+    "uk": "Ukrainian",
+    "be": "Belarusian",
+    "hr": "Croatian",
+    "sl": "Slovenian",
+    "cs": "Czech",
+    "sk": "Slovak",
+    "lt": "Lithuanian",
+    "he": "Hebrew",
+    "sw": "Swahili",
+    "ja": "Japanese",
+    "ko": "Korean",
+    "zh": "Chinese",
+    "zh_s": "Chinese (Simplified)",
+    "zh_t": "Chinese (Traditional)",
+}
+
+def page_section(url):
+    """The site section a page belongs to, such as 'encyclicals', or ''"""
+    segments = urlparse(url).path.split('/')
+    for i, segment in enumerate(segments[:-1]):
+        if _LANGUAGE_SEGMENT_RE.match(segment):
+            return segments[i + 1].split('.')[0]
+    return ''
+
+def page_language(url):
+    """The language segment of a page's path, such as 'en', or ''"""
+    for segment in urlparse(url).path.split('/')[:-1]:
+        if _LANGUAGE_SEGMENT_RE.match(segment):
+            return segment
+    return ''
+
+class LinkHarvester(HTMLParser):
+    """Tokenizer that keeps only document links and never builds a tree.
+    
+    Start tags are filtered as the tokenizer reaches them and everything
+    else is discarded, so an index page costs one pass over its bytes and
+    memory only for the links kept.
+    """
+    
+    def __init__(self, page_url):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.links = []
+    
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        for name, value in attrs:
+            if name == 'href' and value:
+                full_url = urljoin(self.page_url, value)
+                if is_document_link(full_url, self.page_url):
+                    self.links.append(full_url)
+                return
+
+_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_-]+)', re.IGNORECASE)
+
+def _sniff_encoding(content):
+    """Encoding declared in the page's <meta> tags, defaulting to UTF-8"""
+    match = _CHARSET_RE.search(content[:4096])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+def harvest_links(chunks, url, encoding=None):
+    """Stream an index page's byte chunks through LinkHarvester.
+    
+    `chunks` may be any iterable of bytes, such as a streamed response body.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    decoder = codecs.getincrementaldecoder(encoding or _sniff_encoding(first))('replace')
+    harvester = LinkHarvester(url)
+    harvester.feed(decoder.decode(first))
+    for chunk in chunks:
+        harvester.feed(decoder.decode(chunk))
+    harvester.feed(decoder.decode(b'', final=True))
+    harvester.close()
+    return harvester.links
+
+def harvest_sitemap(chunks):
+    """Pull-parse a sitemap's byte chunks, yielding (kind, loc, lastmod) per entry.
+    
+    kind is 'sitemap' for an entry of a sitemap index and 'url' for a page;
+    lastmod is None when absent. Entries are yielded as they are parsed and
+    then cleared, so no tree of the whole sitemap is built. Gzipped sitemaps
+    are inflated chunk by chunk. Raises ElementTree.ParseError on bad XML.
+    """
+    parser = ElementTree.XMLPullParser(events=('end',))
+    inflater = None
+    for chunk in chunks:
+        if inflater is None:
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+        parser.feed(inflater.decompress(chunk) if inflater else chunk)
+        yield from _sitemap_entries(parser)
+    parser.close()
+    yield from _sitemap_entries(parser)
+
+def _sitemap_entries(parser):
+    for _, element in parser.read_events():
+        kind = element.tag.rsplit('}', 1)[-1]  # Tags are namespaced
+        if kind not in ('url', 'sitemap'):
+            continue
+        fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in element}
+        element.clear()
+        if fields.get('loc'):
+            yield kind, fields['loc'], fields.get('lastmod') or None
+
+def parse_lastmod(value):
+    """A sitemap <lastmod> W3C datetime as a POSIX timestamp, or None"""
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+# The title selectors, in priority order, as (tag, class, inside .content):
+# 'h1', 'h2.doc_title', '.doc_title', '.title', 'title', 'h2',
+# '.content h1', '.content h2'
+TITLE_SELECTORS = [
+    ('h1', None, False),
+    ('h2', 'doc_title', False),
+    (None, 'doc_title', False),
+    (None, 'title', False),
+    ('title', None, False),
+    ('h2', None, False),
+    ('h1', None, True),
+    ('h2', None, True),
+]
+
+DATE_PATTERNS = [
+    re.compile(r'(\d{1,2})\s+(\w+)\s+(\d{4})'),  # 15 May 1891
+    re.compile(r'(\d{4})-(\d{2})-(\d{2})'),      # 1891-05-15
+    re.compile(r'(\w+)\s+(\d{1,2}),\s+(\d{4})'), # May 15, 1891
+]
+
+# Text inside these elements is not page text
+_NON_TEXT_TAGS = frozenset(['script', 'style', 'template'])
+
+# Elements that start a new paragraph of body text
+_BLOCK_TAGS = frozenset(['p', 'div', 'br', 'li', 'ul', 'ol', 'dl', 'dt', 'dd', 'tr', 'table',
+                         'blockquote', 'pre', 'hr', 'section', 'article', 'center',
+                         'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+def _clean_body(parts):
+    """Join text parts into paragraphs, splitting at None and collapsing whitespace"""
+    paragraphs = []
+    current = []
+    for part in parts + [None]:
+        if part is None:
+            paragraph = ' '.join(''.join(current).split())
+            if paragraph:
+                paragraphs.append(paragraph)
+            current = []
+        else:
+            current.append(part)
+    return '\n\n'.join(paragraphs)
+
+def _find_date(text):
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(0)
+    return ""
+
+def scan_document(tree, body=False):
+    """Collect the title, first paragraph and date of a page in one walk.
+    
+    Each title selector keeps the text of its first match, as select_one
+    would. The first selector whose match has text wins. Text is checked for
+    a date as it streams past, so the date nearest the top of the page is
+    found. The walk stops once the title, the first <p> and a date are
+    all known, unless body is set: then it runs to the end and also
+    returns the page's cleaned text, taken from the .content area when
+    there is one. Returns (title, first paragraph, date, body text or None).
+    """
+    selector_text = [None] * len(TITLE_SELECTORS)  # First match's text parts
+    selector_closed = [False] * len(TITLE_SELECTORS)
+    paragraph = None
+    paragraph_closed = False
+    title = None
+    
+    open_elements = []  # (inside .content, collectors opened here, non-text, tag)
+    collecting = []  # Text parts lists of every open collector
+    non_text_depth = 0
+    head_depth = 0
+    page_text = []  # Body text parts, None between paragraphs
+    content_text = []  # The same, only from inside .content
+    date = ""
+    date_window = ""
+    pending_text = []
+    pending_len = 0
+    
+    for event, value, classes in iter_page_events(tree):
+        if event == _TEXT:
+            if non_text_depth:
+                continue
+            for parts in collecting:
+                parts.append(value)
+            if body and not head_depth:
+                page_text.append(value)
+                if open_elements and open_elements[-1][0]:
+                    content_text.append(value)
+            if not date:
+                pending_text.append(value)
+                pending_len += len(value)
+                if pending_len >= 1024:
+                    # Keep a little overlap so a date split across checks is found
+                    date_window = date_window[-64:] + ''.join(pending_text)
+                    pending_text, pending_len = [], 0
+                    date = _find_date(date_window)
+        
+        elif event == _START:
+            parent_in_content = open_elements[-1][0] if open_elements else False
+            opened = []
+            for i, (tag, cls, inside_content) in enumerate(TITLE_SELECTORS):
+                if (selector_text[i] is None and (tag is None or tag == value) and
+                        (cls is None or cls in classes) and
+                        (not inside_content or parent_in_content)):
+                    selector_text[i] = []
+                    opened.append(i)
+            if value == 'p' and paragraph is None:
+                paragraph = []
+                opened.append('p')
+            for key in opened:
+                collecting.append(paragraph if key == 'p' else selector_text[key])
+            non_text = value in _NON_TEXT_TAGS
+            non_text_depth += non_text
+            head_depth += value == 'head'
+            in_content = parent_in_content or 'content' in classes
+            open_elements.append((in_content, opened, non_text, value))
+            if body and value in _BLOCK_TAGS:
+                page_text.append(None)
+                content_text.append(None)
+        
+        else:
+            _, opened, non_text, tag = open_elements.pop()
+            non_text_depth -= non_text
+            head_depth -= tag == 'head'
+            if body and tag in _BLOCK_TAGS:
+                page_text.append(None)
+                content_text.append(None)
+            if not opened:
+                continue
+            del collecting[-len(opened):]
+            for key in opened:
+                if key == 'p':
+                    paragraph_closed = True
+                else:
+                    selector_closed[key] = True
+            
+            # The title is settled once a closed match with text has only
+            # closed, empty matches ahead of it in priority
+            if title is None:
+                for i, parts in enumerate(selector_text):
+                    if parts is None or not selector_closed[i]:
+                        break
+                    text = ''.join(parts).strip()
+                    if text:
+                        title = text
+                        break
+            if title is not None and paragraph_closed and date and not body:
+                break
+    
+    if title is None:
+        title = next((text for text in (''.join(parts).strip()
+                                        for parts in selector_text if parts) if text), "")
+    if not date:
+        date = _find_date(date_window[-64:] + ''.join(pending_text))
+    body_text = None
+    if body:
+        body_text = _clean_body(content_text) or _clean_body(page_text)
+    return title, (''.join(paragraph).strip() if paragraph else None), date, body_text
+
+def extract_document_fields(soup, url, text=False):
+    """Extract document information from a parsed Vatican page.
+    
+    text also returns the page's cleaned body text under 'body'.
+    """
+    # Title, first paragraph and date (and the body) come from a single walk of the page
+    title, first_paragraph, date, body = scan_document(soup, body=text)
+    
+    if not title:
+        title = urlparse(url).path.split('/')[-1].replace('.html', '').replace('-', ' ').title()
+    
+    # Clean up title
+    title = re.sub(r'\s+', ' ', title).strip()
+    
+    # Document type and language from the URL's section and language segments
+    section = page_section(url) or next(
+        (segment for segment in urlparse(url).path.split('/') if segment in DOCUMENT_TYPES), '')
+    doc_type = DOCUMENT_TYPES.get(section) or section.replace('_', ' ').title() or "Unknown"
+    segment = page_language(url)
+    language = LANGUAGES.get(segment, segment or "Unknown")
+    
+    # Try to get description from first paragraph
+    description = ""
+    if first_paragraph:
+        desc_text = first_paragraph
+        if len(desc_text) > 50:
+            description = desc_text[:200] + "..." if len(desc_text) > 200 else desc_text
+    
+    fields = {
+        'title': title,
+        'url': url,
+        'type': doc_type,
+        'date': date,
+        'language': language,
+        'description': description
+    }
+    if text:
+        fields['body'] = body
+    return fields
+
+def parse_page_links(content, url):
+    """Raw index page bytes to document links; safe to run in a worker process"""
+    return harvest_links([content], url)
+
+def parse_document(content, url, backend='html.parser', text=False):
+    """Raw document page bytes to an extraction dict; safe to run in a worker process"""
+    return extract_document_fields(parse_html(content, backend), url, text)
+
+def parse_document_timed(content, url, backend='html.parser', text=False):
+    """parse_document, also returning seconds spent building the tree and extracting"""
+    started = time.perf_counter()
+    tree = parse_html(content, backend)
+    parsed = time.perf_counter()
+    doc_info = extract_document_fields(tree, url, text)
+    return doc_info, {'parse': parsed - started, 'extract': time.perf_counter() - parsed}
+
+_LANGUAGE_SEGMENT_RE = re.compile(r'^[a-z]{2}(?:[-_][a-z]{1,2})?$')  # en, pt_br, zh_t
+
+def document_key(url):
+    """Canonical key shared by every language version of a document.
+    
+    vatican.va serves translations under the same file name with only the
+    language segment changed, so the key is the lowercased path with the
+    /content prefix, the language segment and the extension removed:
+    .../content/leo-xiii/en/encyclicals/documents/hf_l-xiii_enc_x.html
+    becomes leo-xiii/encyclicals/documents/hf_l-xiii_enc_x.
+    """
+    path = _fold_pope_spellings(urlparse(url).path.lower())
+    segments = [segment for segment in path.split('/') if segment]
+    if segments and segments[0] == 'content':
+        segments = segments[1:]
+    segments = [segment for segment in segments if not _LANGUAGE_SEGMENT_RE.match(segment)]
+    if segments and segments[-1].endswith('.html'):
+        segments[-1] = segments[-1][:-len('.html')]
+    return '/'.join(segments)
+
+def document_id(url):
+    """Stable short ID for a new document, derived from its canonical key"""
+    return hashlib.sha1(document_key(url).encode('utf-8')).hexdigest()[:16]
+
+def unique_document_id(url, taken):
+    """document_id(url), suffixed if needed to avoid the IDs in taken"""
+    doc_id = base = document_id(url)
+    suffix = 2
+    while doc_id in taken:
+        doc_id = f"{base}-{suffix}"
+        suffix += 1
+    return doc_id
+
+# Snapshot formats by file extension: (serialization, compression)
+STORE_FORMATS = {
+    '.json': ('json', None),
+    '.json.gz': ('json', 'gzip'),
+    '.json.zst': ('json', 'zstd'),
+    '.msgpack': ('msgpack', None),
+    '.msgpack.zst': ('msgpack', 'zstd'),
+}
+_FORMAT_MODULES = {'zstd': 'zstandard', 'msgpack': 'msgpack'}
+
+def store_format(path):
+    """(serialization, compression) for a snapshot file, picked by extension.
+    
+    Names without a known extension are plain JSON, as they always were.
+    """
+    name = Path(path).name.lower()
+    for suffix in sorted(STORE_FORMATS, key=len, reverse=True):
+        if name.endswith(suffix):
+            return STORE_FORMATS[suffix]
+    return STORE_FORMATS['.json']
+
+def store_format_missing(path):
+    """Names of the packages a snapshot format needs that are not installed"""
+    return [_FORMAT_MODULES[part] for part in store_format(path)
+            if part in _FORMAT_MODULES and importlib.util.find_spec(_FORMAT_MODULES[part]) is None]
+
+def write_snapshot(f, data, path):
+    """Stream data into the binary file f in the format path's extension names.
+    
+    Documents are serialized and compressed one at a time rather than
+    building the whole file in memory. Plain JSON stays pretty-printed for
+    diffs; compressed JSON is written compactly.
+    """
+    serialization, compression = store_format(path)
+    if compression == 'gzip':
+        out = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0)
+    elif compression == 'zstd':
+        import zstandard
+        out = zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False)
+    else:
+        out = f
+    if serialization == 'msgpack':
+        import msgpack
+        packer = msgpack.Packer()
+        other = {key: value for key, value in data.items() if key != "documents"}
+        out.write(packer.pack_map_header(len(other) + 1))
+        for key, value in other.items():
+            out.write(packer.pack(key) + packer.pack(value))
+        out.write(packer.pack("documents") + packer.pack_array_header(len(data["documents"])))
+        for doc in data["documents"]:
+            out.write(packer.pack(doc))
+    else:
+        text = io.TextIOWrapper(out, encoding='utf-8', write_through=True)
+        if compression:
+            json.dump(data, text, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(data, text, indent=2, ensure_ascii=False)
+        text.detach()
+    if out is not f:
+        out.close()
+
+def read_snapshot(path):
+    """Load a snapshot written by write_snapshot; ValueError if it is corrupt"""
+    serialization, compression = store_format(path)
+    errors = (EOFError, OSError)
+    with open(path, 'rb') as raw:
+        if compression == 'gzip':
+            f = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif compression == 'zstd':
+            import zstandard
+            f = zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+            errors += (zstandard.ZstdError,)
+        else:
+            f = raw
+        try:
+            if serialization != 'msgpack':
+                return json.load(io.TextIOWrapper(f, encoding='utf-8'))
+            import msgpack
+            errors += (msgpack.UnpackException,)
+            unpacker = msgpack.Unpacker(f, raw=False)
+            data = {}
+            for _ in range(unpacker.read_map_header()):
+                key = unpacker.unpack()
+                if key == "documents":
+                    data[key] = [unpacker.unpack() for _ in range(unpacker.read_array_header())]
+                else:
+                    data[key] = unpacker.unpack()
+            return data
+        except errors as e:
+            raise ValueError(f"Truncated or corrupt {path}: {e}") from e
+
+class DocumentStore(ABC):
+    """Where scraped documents live.
+    
+    VaticanScraper only talks to its store through these methods; the merge
+    rules in add_or_update_document stay in the scraper. Documents are plain
+    dicts. A document returned by find() may be changed in place and is then
+    handed back through update().
+    
+    add() and update() only do in-memory bookkeeping. The changed documents
+    are written by save() or, once start_writer() has been called, by a
+    BackgroundWriter thread. Subclasses implement the actual I/O in
+    _write_batch().
+    """
+    
+    def __init__(self, path, read_only=False):
+        self.path = Path(path)
+        # read_only stores never tidy their files on load; they are for lookups
+        self.read_only = read_only
+        self.metadata = {}
+        self._stored_metadata = {}  # As last written, to tell if a save has anything to add
+        self.writer = None
+        self._dirty = {}  # id -> document changed since the last save
+    
+    @abstractmethod
+    def load(self, default_metadata):
+        """Open the store, creating it with default_metadata if it is new"""
+    
+    @abstractmethod
+    def find(self, title, url):
+        """Return the document with this URL or title, else one sharing its canonical key"""
+    
+    @abstractmethod
+    def add(self, doc):
+        """Store a new document, giving it an 'id' if it has none"""
+    
+    @abstractmethod
+    def update(self, doc):
+        """Persist changes made to a document returned by find()"""
+    
+    @abstractmethod
+    def has(self, doc_id):
+        """Whether a document with this ID is stored"""
+    
+    @abstractmethod
+    def count(self):
+        """How many documents are stored"""
+    
+    @abstractmethod
+    def documents(self):
+        """Iterate over every stored document"""
+    
+    @abstractmethod
+    def _write_batch(self, docs, metadata, compact=False):
+        """Durably write docs and metadata; may run on the writer thread"""
+    
+    def sync_metadata(self):
+        """Refresh metadata kept outside this store's own, before a save.
+        
+        It may read the store, so it is called from the thread that owns
+        the store even when the save itself runs on another.
+        """
+    
+    def _metadata_changed(self, metadata):
+        """Whether metadata differs from what was last written, beyond its last_updated stamp"""
+        def significant(m):
+            return {key: value for key, value in m.items() if key != "last_updated"}
+        return significant(metadata) != significant(self._stored_metadata)
+    
+    def _changed(self, doc):
+        """Queue a changed document for the next write"""
+        if self.writer:
+            self.writer.submit(doc)
+        else:
+            self._dirty[doc["id"]] = doc
+    
+    def _written(self, docs):
+        """Called once docs are durable"""
+    
+    def start_writer(self, **thresholds):
+        """Hand all further writes to a BackgroundWriter thread"""
+        if self.writer is None:
+            if self._dirty:
+                self.save()
+            self.writer = BackgroundWriter(self, **thresholds)
+    
+    def save(self, compact=False):
+        """Make every change so far durable.
+        
+        compact also asks the store to tidy its on-disk form, e.g. fold the
+        JSON change journal into the snapshot.
+        """
+        if self.writer:
+            self.writer.flush(dict(self.metadata), compact)
+            return
+        docs = list(self._dirty.values())
+        self._dirty.clear()
+        self._write_batch(docs, self.metadata, compact)
+        self._written(docs)
+    
+    def close(self):
+        """Write anything outstanding and stop the writer thread, if any"""
+        if self.writer:
+            self.writer.close(dict(self.metadata))
+            self.writer = None
+        elif self._dirty:
+            self.save()
+
+class BackgroundWriter:
+    """Write-behind persistence for a DocumentStore.
+    
+    The crawl thread passes in snapshots of changed documents and carries
+    on. A daemon thread coalesces them by ID and writes a batch once
+    `max_documents` documents or about `max_bytes` of data are waiting, or
+    `max_interval` seconds after the oldest unwritten change. So a fast
+    crawl writes big batches and a slow one still writes regularly.
+    flush() forces a batch and waits for it. Pending changes are also
+    flushed at interpreter exit. A batch that fails to write stays pending
+    and is retried on the next timer or flush(); the error is raised to
+    the flush() caller.
+    """
+    
+    def __init__(self, store, max_interval=5.0, max_documents=500, max_bytes=4 * 1024 * 1024):
+        self.store = store
+        self.max_interval = max_interval
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.batches = 0
+        self.documents_written = 0
+        self.error = None
+        self._metadata = dict(store.metadata)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="document-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, doc):
+        """Queue a snapshot of doc; never blocks on I/O or serialization"""
+        snapshot = {key: list(value) if isinstance(value, list) else
+                         dict(value) if isinstance(value, dict) else value
+                    for key, value in doc.items()}
+        self._queue.put(('doc', snapshot))
+    
+    def flush(self, metadata=None, compact=False):
+        """Write everything queued so far and wait until it is durable"""
+        done = threading.Event()
+        self._queue.put(('flush', (metadata, compact, done)))
+        done.wait()
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+    
+    def close(self, metadata=None):
+        """Flush what is pending and stop the thread"""
+        atexit.unregister(self.close)
+        if self._thread.is_alive():
+            self.flush(metadata)
+            self._queue.put(('stop', None))
+            self._thread.join()
+    
+    @staticmethod
+    def _estimate_size(doc):
+        return sum(len(value) if isinstance(value, str) else 16 for value in doc.values())
+    
+    def _run(self):
+        pending = {}
+        pending_bytes = 0
+        oldest = None
+        failing = False  # The last write failed; only the timer or a flush retries it
+        while True:
+            timeout = None if oldest is None else max(0.0, oldest + self.max_interval - time.monotonic())
+            try:
+                kind, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, payload = 'timer', None
+            
+            if kind == 'doc':
+                pending[payload["id"]] = payload
+                pending_bytes += self._estimate_size(payload)
+                if oldest is None:
+                    oldest = time.monotonic()
+                if failing or (len(pending) < self.max_documents and pending_bytes < self.max_bytes):
+                    continue
+                compact, done = False, None
+            elif kind == 'flush':
+                metadata, compact, done = payload
+                if metadata is not None:
+                    self._metadata = metadata
+            elif kind == 'stop':
+                return
+            else:
+                compact, done = False, None
+            
+            if pending or compact:
+                docs = list(pending.values())
+                try:
+                    self.store._write_batch(docs, self._metadata, compact)
+                except Exception as e:  # Reported to the next flush() caller
+                    print(f"Error writing documents: {e}; keeping {len(docs)} to retry")
+                    self.error = e
+                    failing = True
+                    oldest = time.monotonic()
+                else:
+                    self.store._written(docs)
+                    self.batches += 1
+                    self.documents_written += len(docs)
+                    failing = False
+                    pending.clear()
+                    pending_bytes = 0
+                    oldest = None
+            if done:
+                done.set()
+
+def open_document_store(spec, lazy=False, popes=("leo-xiii",), read_only=False):
+    """Open the store named by spec: 'sqlite:path.db', 'dir:path', 'json:path.json'
+    or a plain JSON path.
+    
+    lazy opens a JSON store as a LazyJsonStore; the others are always read on
+    demand. A spec containing {pope} opens a PerPopeStore over popes.
+    read_only opens it for lookups alone, never compacting or repairing it.
+    """
+    spec = str(spec)
+    if '{pope}' in spec:
+        return PerPopeStore(spec, popes, lazy, read_only)
+    scheme, _, path = spec.partition(':')
+    if scheme == 'sqlite' and path:
+        return SqliteStore(path, read_only)
+    if scheme == 'dir' and path:
+        return DirectoryStore(path, read_only)
+    if not (scheme == 'json' and path):
+        path = spec
+    if lazy and store_format(path) != ('json', None):
+        print(f"Lazy loading needs an uncompressed .json store; loading {path} in full")
+        lazy = False
+    return LazyJsonStore(path, read_only) if lazy else JsonStore(path, read_only)
+
+class _DocumentIndex:
+    """Lookup indexes over a store's documents by position, kept in memory.
+    
+    Each index maps to the position of the first matching document, so
+    lookups return the same document a front-to-back scan would. Stores
+    using it provide _document_at(position).
+    """
+    
+    def _build_indexes(self, documents):
+        """Index documents by title, by every URL and by canonical key"""
+        self._title_index = {}
+        self._url_index = {}
+        self._key_index = {}
+        self._ids = set()
+        for position, doc in enumerate(documents):
+            self._index_document(doc, position)
+    
+    def _index_document(self, doc, position):
+        """Add a document's title, URLs and keys to the lookup indexes"""
+        self._index_fields(position, doc["id"], doc["title"], doc.get("urls", []) + [doc["url"]])
+    
+    def _index_fields(self, position, doc_id, title, urls):
+        self._ids.add(doc_id)
+        self._title_index.setdefault(title, position)
+        for url in urls:
+            self._url_index.setdefault(canonical_url(url), position)
+            self._key_index.setdefault(document_key(url), position)
+    
+    def find(self, title, url):
+        positions = [position for position in (self._url_index.get(canonical_url(url)),
+                                               self._title_index.get(title))
+                     if position is not None]
+        if positions:
+            return self._document_at(min(positions))
+        position = self._key_index.get(document_key(url))
+        return self._document_at(position) if position is not None else None
+    
+    def has(self, doc_id):
+        return doc_id in self._ids
+
+class _LazyRecords(_DocumentIndex, ABC):
+    """Documents held as on-disk records, read back on demand.
+    
+    _records maps each position to a live document, while it is changed
+    and not yet written, or to whatever _read_record() needs to load it.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._records = []  # position -> live document or on-disk record
+        self._id_positions = {}
+        self._records_lock = threading.Lock()
+    
+    # Records are found by ID, so these skip any other position map a store
+    # later in the MRO keeps, such as JsonStore's id(doc) -> position
+    def _build_indexes(self, documents):
+        self._id_positions = {}
+        _DocumentIndex._build_indexes(self, documents)
+    
+    def _index_document(self, doc, position):
+        self._id_positions[doc["id"]] = position
+        _DocumentIndex._index_document(self, doc, position)
+    
+    def _document_at(self, position):
+        with self._records_lock:
+            record = self._records[position]
+        if isinstance(record, dict):
+            return record
+        return self._read_record(position, record)
+    
+    @abstractmethod
+    def _read_record(self, position, record):
+        """Load the document at position from its on-disk record"""
+    
+    def add(self, doc):
+        if "id" not in doc:
+            doc["id"] = unique_document_id(doc["url"], self._ids)
+        with self._records_lock:
+            self._records.append(doc)
+            position = len(self._records) - 1
+        self._index_document(doc, position)
+        self._changed(doc)
+    
+    def update(self, doc):
+        # find() may have handed out a fresh copy read from disk; it becomes
+        # the live version until it is written
+        position = self._id_positions[doc["id"]]
+        with self._records_lock:
+            self._records[position] = doc
+        self._index_document(doc, position)
+        self._changed(doc)
+    
+    def count(self):
+        return len(self._records)
+    
+    def documents(self):
+        return (self._document_at(position) for position in range(len(self._records)))
+
+class JsonStore(_DocumentIndex, DocumentStore):
+    """The whole corpus in one JSON snapshot plus an append-only change journal.
+    
+    Documents are held in memory and indexed by title, by every URL and by
+    canonical key. Writes append only the changed documents to
+    <file>.journal. load() replays the journal over the snapshot.
+    Compaction folds the journal back into the snapshot atomically, at the
+    end of a crawl or on load once the journal outgrows the snapshot.
+    
+    The snapshot is written in the format its extension names (see
+    STORE_FORMATS); the journal is always JSON lines.
+    """
+    
+    def __init__(self, path, read_only=False):
+        super().__init__(path, read_only)
+        missing = store_format_missing(self.path)
+        if missing:
+            raise ImportError(f"{self.path.name} needs {' and '.join(missing)}: pip install {' '.join(missing)}")
+        # Per-document upserts since the last snapshot; replayed on load
+        self.journal_file = self.path.with_name(self.path.name + ".journal")
+        self.journal_compact_bytes = 1024 * 1024  # Never compact a journal smaller than this
+        self.data = {"metadata": self.metadata, "documents": []}
+        self._ids_assigned = False  # Pre-ID documents were given IDs the snapshot lacks
+        self._build_indexes([])
+    
+    def load(self, default_metadata):
+        """Load the snapshot file and replay the change journal over it"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = None
+        if self.path.exists():
+            try:
+                data = read_snapshot(self.path)
+                print(f"Loaded {len(data.get('documents', []))} existing documents")
+            except (ValueError, OSError) as e:
+                print(f"Error loading existing data: {e}")
+                print("Starting with fresh data...")
+                data = None
+        
+        if data is None:
+            data = {"metadata": dict(default_metadata), "documents": []}
+        data.setdefault("metadata", dict(default_metadata))
+        data.setdefault("documents", [])
+        self._ids_assigned = self._assign_ids(data["documents"])
+        self._replay_journal(data)
+        self._build_indexes(data["documents"])
+        self.data = data
+        self.metadata = data["metadata"]
+        self._stored_metadata = dict(self.metadata)
+        
+        journal_bytes = self.journal_file.stat().st_size if self.journal_file.exists() else 0
+        snapshot_bytes = self.path.stat().st_size if self.path.exists() else 0
+        if journal_bytes > max(snapshot_bytes, self.journal_compact_bytes) and not self.read_only:
+            self._compact()
+    
+    def _assign_ids(self, documents):
+        """Give documents saved before IDs existed a stable, unique one; True if any lacked one"""
+        seen = {doc["id"] for doc in documents if "id" in doc}
+        assigned = False
+        for doc in documents:
+            if "id" not in doc:
+                doc["id"] = unique_document_id(doc.get("urls", [doc["url"]])[0], seen)
+                seen.add(doc["id"])
+                assigned = True
+        return assigned
+    
+    def _replay_journal(self, data):
+        """Apply journaled upserts written since the snapshot was saved"""
+        if not self.journal_file.exists():
+            return
+        documents = data["documents"]
+        positions = {doc["id"]: position for position, doc in enumerate(documents)}
+        replayed = 0
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A torn final line from an interrupted save
+                if "metadata" in entry:
+                    data["metadata"].update(entry["metadata"])
+                    continue
+                doc = entry["doc"]
+                position = positions.get(doc["id"])
+                if position is None:
+                    positions[doc["id"]] = len(documents)
+                    documents.append(doc)
+                else:
+                    documents[position] = doc
+                replayed += 1
+        print(f"Replayed {replayed} journaled changes from {self.journal_file}")
+    
+    def _build_indexes(self, documents):
+        self._positions = {}  # id(doc) -> position
+        super()._build_indexes(documents)
+    
+    def _index_document(self, doc, position):
+        self._positions[id(doc)] = position
+        super()._index_document(doc, position)
+    
+    def _document_at(self, position):
+        return self.data["documents"][position]
+    
+    def add(self, doc):
+        if "id" not in doc:
+            doc["id"] = unique_document_id(doc["url"], self._ids)
+        self.data["documents"].append(doc)
+        self._index_document(doc, len(self.data["documents"]) - 1)
+        self._changed(doc)
+    
+    def update(self, doc):
+        # Re-indexing is idempotent and picks up any URLs added in place
+        self._index_document(doc, self._positions[id(doc)])
+        self._changed(doc)
+    
+    def count(self):
+        return len(self.data["documents"])
+    
+    def documents(self):
+        return iter(self.data["documents"])
+    
+    def _write_batch(self, docs, metadata, compact=False):
+        """Append docs to the journal, or compact when asked.
+        
+        Compaction reads every live document, so it is only requested while
+        the crawl is not changing them (the final save). It is skipped when
+        there is nothing to fold in; docs and changed metadata (other than
+        the last_updated stamp) are then journaled instead.
+        """
+        if compact and self._needs_compaction():
+            self._compact(metadata)
+        elif docs or (compact and self._metadata_changed(metadata)):
+            self._append_journal(docs, metadata)
+        else:
+            return
+        self._stored_metadata = dict(metadata)
+    
+    def _needs_compaction(self):
+        """Whether the snapshot is missing or out of date"""
+        journal_bytes = self.journal_file.stat().st_size if self.journal_file.exists() else 0
+        return journal_bytes > 0 or self._ids_assigned or not self.path.exists()
+    
+    def _append_journal(self, docs, metadata):
+        """Append one upsert per document, then fsync"""
+        lines = [json.dumps({"doc": doc}, ensure_ascii=False) for doc in docs]
+        lines.append(json.dumps({"metadata": metadata}, ensure_ascii=False))
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"Journaled {len(docs)} changed documents to {self.journal_file}")
+    
+    def _compact(self, metadata=None):
+        """Atomically rewrite the snapshot with every document and empty the journal"""
+        data = dict(self.data, metadata=metadata or self.metadata)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'wb') as f:
+            write_snapshot(f, data, self.path)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # Replaying a stale journal over the new snapshot would be harmless,
+        # so it is only removed once the snapshot is safely in place
+        if self.journal_file.exists():
+            self.journal_file.unlink()
+        self._ids_assigned = False
+        print(f"Saved {len(data['documents'])} documents to {self.path}")
+
+_JSON_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+class _SnapshotReader:
+    """Stream the documents out of a JSON snapshot one at a time.
+    
+    The file is decoded in chunks and the top-level object is walked by
+    hand; each value, and each item of the "documents" array, is parsed by
+    the json module's raw_decode straight from the buffer. documents()
+    yields (doc, byte offset, byte length) so a document can be read back
+    with one seek. The other top-level keys are collected in `rest`.
+    """
+    
+    def __init__(self, f, chunk_size=1024 * 1024):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.rest = {}
+        self.text = ''
+        self.pos = 0
+        self.offset = 0  # Byte offset of text[pos] in the file
+        self.eof = False
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+    
+    def documents(self):
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()[0]
+            self._expect(':')
+            if key == 'documents' and self._peek() == '[':
+                self._advance(self.pos + 1)
+                if self._peek() == ']':
+                    self._advance(self.pos + 1)
+                else:
+                    while True:
+                        yield self._value()
+                        if self._separator(']'):
+                            break
+            else:
+                self.rest[key] = self._value()[0]
+            if self._separator('}'):
+                return
+    
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        self.eof = not chunk
+        self.text = self.text[self.pos:] + self._utf8.decode(chunk, final=self.eof)
+        self.pos = 0
+    
+    def _advance(self, end):
+        self.offset += len(self.text[self.pos:end].encode('utf-8'))
+        self.pos = end
+    
+    def _peek(self):
+        """Skip whitespace and return the next character, '' at the end of the file"""
+        while True:
+            self._advance(_JSON_WHITESPACE_RE.match(self.text, self.pos).end())
+            if self.pos < len(self.text) or self.eof:
+                return self.text[self.pos:self.pos + 1]
+            self._fill()
+    
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} at byte {self.offset}")
+        self._advance(self.pos + 1)
+    
+    def _separator(self, closing):
+        """Consume a comma or the closing bracket; True at the closing bracket"""
+        char = self._peek()
+        if char not in (',', closing):
+            raise ValueError(f"Expected ',' or {closing!r} at byte {self.offset}")
+        self._advance(self.pos + 1)
+        return char == closing
+    
+    def _value(self):
+        """Parse the next value, reading more of the file until it is complete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.text, self.pos)
+                # A value running to the end of the buffer may be a cut-off number
+                if end < len(self.text) or self.eof:
+                    start = self.offset
+                    self._advance(end)
+                    return value, start, self.offset - start
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+class LazyJsonStore(_LazyRecords, JsonStore):
+    """A JsonStore that keeps only its lookup indexes in memory.
+    
+    load() streams through the snapshot and journal once, remembering where
+    the latest version of each document lives on disk, and indexes titles,
+    URLs and keys. find() and documents() read full records back on demand.
+    Documents added or changed during a run stay resident only until they
+    are journaled, so memory follows the size of the crawl, not the corpus.
+    The files are the same as JsonStore's.
+    """
+    
+    SNAPSHOT, JOURNAL = 0, 1
+    
+    def __init__(self, path, read_only=False):
+        super().__init__(path, read_only)
+        if store_format(self.path) != ('json', None):
+            raise ValueError(f"Lazy loading needs an uncompressed .json store, not {self.path.name}")
+        # Records on disk are (source, offset, length)
+        self._assigned_ids = {}  # position -> ID given to a pre-ID document, until compacted
+        self._journaled = {}  # id -> (offset, length) of the line last appended for it
+        self._read_lock = threading.Lock()
+        self._handles = {}
+    
+    def load(self, default_metadata):
+        """Index the snapshot and journal without keeping documents in memory"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        metadata = dict(default_metadata)
+        entries = []  # position -> [record, id, title, urls]
+        if self.path.exists():
+            try:
+                entries = self._scan_snapshot(metadata)
+            except (ValueError, KeyError, TypeError, OSError) as e:
+                print(f"Error loading existing data: {e}")
+                print("Starting with fresh data...")
+                metadata, entries = dict(default_metadata), []
+        
+        seen = {entry[1] for entry in entries if entry[1] is not None}
+        for position, entry in enumerate(entries):
+            if entry[1] is None:
+                entry[1] = self._assigned_ids[position] = unique_document_id(entry[3][0], seen)
+                seen.add(entry[1])
+        self._scan_journal(metadata, entries)
+        
+        self.metadata = metadata
+        self._stored_metadata = dict(metadata)
+        self._build_indexes([])
+        self._records = [entry[0] for entry in entries]
+        for position, (_, doc_id, title, urls) in enumerate(entries):
+            self._id_positions[doc_id] = position
+            self._index_fields(position, doc_id, title, urls)
+        print(f"Indexed {len(entries)} existing documents in {time.perf_counter() - start:.2f}s")
+        
+        journal_bytes = self.journal_file.stat().st_size if self.journal_file.exists() else 0
+        snapshot_bytes = self.path.stat().st_size if self.path.exists() else 0
+        if (self._assigned_ids or journal_bytes > max(snapshot_bytes, self.journal_compact_bytes)) and not self.read_only:
+            self._compact()
+    
+    @staticmethod
+    def _summary(record, doc):
+        """The fields the indexes need; the rest of doc is dropped"""
+        urls = doc.get("urls", []) + [doc["url"]]
+        return [record, doc.get("id"), doc["title"], urls]
+    
+    def _scan_snapshot(self, metadata):
+        with open(self.path, 'rb') as f:
+            reader = _SnapshotReader(f)
+            entries = [self._summary((self.SNAPSHOT, offset, length), doc)
+                       for doc, offset, length in reader.documents()]
+        metadata.update(reader.rest.get("metadata", {}))
+        return entries
+    
+    def _scan_journal(self, metadata, entries):
+        """Point entries at journaled versions written since the snapshot"""
+        if not self.journal_file.exists():
+            return
+        positions = {entry[1]: position for position, entry in enumerate(entries)}
+        replayed = 0
+        offset = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A torn final line from an interrupted save
+                if "metadata" in entry:
+                    metadata.update(entry["metadata"])
+                else:
+                    doc = entry["doc"]
+                    summary = self._summary((self.JOURNAL, offset, len(line)), doc)
+                    position = positions.setdefault(doc["id"], len(entries))
+                    if position == len(entries):
+                        entries.append(summary)
+                    else:
+                        entries[position] = summary
+                    replayed += 1
+                offset += len(line)
+        print(f"Replayed {replayed} journaled changes from {self.journal_file}")
+    
+    def _read_record(self, position, record):
+        source, offset, length = record
+        with self._read_lock:
+            f = self._handles.get(source)
+            if f is None:
+                f = self._handles[source] = open(
+                    self.path if source == self.SNAPSHOT else self.journal_file, 'rb')
+            f.seek(offset)
+            raw = f.read(length)
+        doc = json.loads(raw) if source == self.SNAPSHOT else json.loads(raw)["doc"]
+        if position in self._assigned_ids:
+            doc.setdefault("id", self._assigned_ids[position])
+        return doc
+    
+    def _append_journal(self, docs, metadata):
+        """Append one upsert per document, noting where each line landed"""
+        lines = [(json.dumps({"doc": doc}, ensure_ascii=False) + "\n").encode('utf-8') for doc in docs]
+        lines.append((json.dumps({"metadata": metadata}, ensure_ascii=False) + "\n").encode('utf-8'))
+        with open(self.journal_file, 'ab') as f:
+            offset = f.tell()
+            for doc, line in zip(docs, lines):
+                self._journaled[doc["id"]] = (offset, len(line))
+                offset += len(line)
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"Journaled {len(docs)} changed documents to {self.journal_file}")
+    
+    def _written(self, docs):
+        # Swap live documents back out for their journal lines, unless they
+        # changed again after the snapshot was taken
+        with self._records_lock:
+            for doc in docs:
+                location = self._journaled.pop(doc["id"], None)
+                position = self._id_positions.get(doc["id"])
+                if location and position is not None and self._records[position] == doc:
+                    self._records[position] = (self.JOURNAL, *location)
+    
+    def _compact(self, metadata=None):
+        """Stream every document into a new snapshot, then empty the journal"""
+        head = json.dumps({"metadata": metadata or self.metadata, "documents": []},
+                          indent=2, ensure_ascii=False)
+        prefix, suffix = head.rsplit('[]', 1)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        records = []
+        with open(tmp, 'wb') as f:
+            f.write((prefix + '[').encode('utf-8'))
+            for position in range(len(self._records)):
+                body = json.dumps(self._document_at(position), indent=2, ensure_ascii=False)
+                f.write(b'\n    ' if position == 0 else b',\n    ')
+                encoded = body.replace('\n', '\n    ').encode('utf-8')
+                records.append((self.SNAPSHOT, f.tell(), len(encoded)))
+                f.write(encoded)
+            f.write(((']' if not records else '\n  ]') + suffix).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        self._close_handles()
+        os.replace(tmp, self.path)
+        if self.journal_file.exists():
+            self.journal_file.unlink()
+        with self._records_lock:
+            self._records = records
+        self._assigned_ids.clear()
+        self._journaled.clear()
+        print(f"Saved {len(records)} documents to {self.path}")
+    
+    def _needs_compaction(self):
+        return bool(self._assigned_ids) or super()._needs_compaction()
+    
+    def _close_handles(self):
+        with self._read_lock:
+            for f in self._handles.values():
+                f.close()
+            self._handles.clear()
+    
+    def close(self):
+        super().close()
+        self._close_handles()
+
+class DirectoryStore(_LazyRecords, DocumentStore):
+    """One JSON file per document, fanned out by ID, plus a manifest.
+    
+    A document's file is documents/<id[:2]>/<id>.json under the store
+    directory; IDs are hashes of the canonical key, so files never move.
+    manifest.json holds the metadata and each document's title and URLs;
+    saves rewrite only the changed documents and append their manifest
+    entries to manifest.journal, which the final save folds back into
+    manifest.json. load() builds the lookup indexes from the manifest
+    alone and documents are read on demand, so git diffs and rsyncs of the
+    directory stay proportional to what changed.
+    
+    Documents are written before their manifest entries. On load, a
+    directory listing finds files newer than the manifest, left by an
+    interrupted save, and only those are opened and re-indexed.
+    """
+    
+    def __init__(self, path, read_only=False):
+        super().__init__(path, read_only)
+        self.manifest_file = self.path / "manifest.json"
+        self.manifest_journal = self.path / "manifest.journal"
+        self._manifest = {}  # id -> {"title", "urls"} of the documents on disk
+        self._build_indexes([])
+    
+    def load(self, default_metadata):
+        start = time.perf_counter()
+        self.metadata = dict(default_metadata)
+        manifest_mtime = None
+        if self.manifest_file.exists():
+            try:
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.metadata.update(data.get("metadata", {}))
+                self._manifest = data.get("documents", {})
+                manifest_mtime = self.manifest_file.stat().st_mtime_ns
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading manifest: {e}")
+                print("Rebuilding it from the document files...")
+        if manifest_mtime is not None and self.manifest_journal.exists():
+            self._replay_manifest_journal()
+            manifest_mtime = max(manifest_mtime, self.manifest_journal.stat().st_mtime_ns)
+        self._stored_metadata = dict(self.metadata)
+        
+        on_disk = set()
+        recovered = 0
+        for doc_id, entry in self._shards():
+            on_disk.add(doc_id)
+            if manifest_mtime is None or doc_id not in self._manifest or entry.stat().st_mtime_ns >= manifest_mtime:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    self._manifest[doc_id] = self._manifest_entry(json.load(f))
+                recovered += 1
+        missing = [doc_id for doc_id in self._manifest if doc_id not in on_disk]
+        for doc_id in missing:
+            del self._manifest[doc_id]
+        
+        self._build_indexes([])
+        self._records = list(self._manifest)
+        for position, (doc_id, entry) in enumerate(self._manifest.items()):
+            self._id_positions[doc_id] = position
+            self._index_fields(position, doc_id, entry["title"], entry["urls"])
+        print(f"Indexed {len(self._records)} existing documents in {time.perf_counter() - start:.2f}s")
+        if (recovered or missing) and not self.read_only:
+            print(f"Re-indexed {recovered} document files and dropped {len(missing)} missing ones")
+            self._write_manifest(self.metadata)
+    
+    def _replay_manifest_journal(self):
+        """Apply manifest entries appended since manifest.json was written"""
+        with open(self.manifest_journal, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A torn final line from an interrupted save
+                if "metadata" in entry:
+                    self.metadata.update(entry["metadata"])
+                else:
+                    self._manifest[entry["id"]] = {"title": entry["title"], "urls": entry["urls"]}
+    
+    def _shards(self):
+        """(id, DirEntry) for every document file"""
+        documents_dir = self.path / "documents"
+        if not documents_dir.is_dir():
+            return
+        for fan in os.scandir(documents_dir):
+            if fan.is_dir():
+                for entry in os.scandir(fan.path):
+                    if entry.name.endswith('.json'):
+                        yield entry.name[:-len('.json')], entry
+    
+    def _shard_path(self, doc_id):
+        return self.path / "documents" / doc_id[:2] / f"{doc_id}.json"
+    
+    @staticmethod
+    def _manifest_entry(doc):
+        return {"title": doc["title"], "urls": list(dict.fromkeys(doc.get("urls", []) + [doc["url"]]))}
+    
+    def _read_record(self, position, doc_id):
+        with open(self._shard_path(doc_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _write_batch(self, docs, metadata, compact=False):
+        """Write each changed document's file, then its manifest entry.
+        
+        Entries are appended to the manifest journal, and on compact any
+        changed metadata; compact folds the journal into manifest.json, as
+        does a journal grown larger than the manifest.
+        """
+        for doc in docs:
+            path = self._shard_path(doc["id"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(doc, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+            os.replace(tmp, path)
+            self._manifest[doc["id"]] = self._manifest_entry(doc)
+        if docs or (compact and self._metadata_changed(metadata)):
+            self._append_manifest_journal(docs, metadata)
+            self._stored_metadata = dict(metadata)
+        if docs:
+            print(f"Wrote {len(docs)} changed documents to {self.path}")
+        journal_bytes = self.manifest_journal.stat().st_size if self.manifest_journal.exists() else 0
+        manifest_bytes = self.manifest_file.stat().st_size if self.manifest_file.exists() else 0
+        if (compact and (journal_bytes or not manifest_bytes)) or journal_bytes > manifest_bytes:
+            self._write_manifest(metadata)
+    
+    def _append_manifest_journal(self, docs, metadata):
+        self.path.mkdir(parents=True, exist_ok=True)
+        lines = [json.dumps(dict(self._manifest[doc["id"]], id=doc["id"]), ensure_ascii=False) for doc in docs]
+        lines.append(json.dumps({"metadata": metadata}, ensure_ascii=False))
+        with open(self.manifest_journal, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _write_manifest(self, metadata):
+        """Atomically rewrite manifest.json with every entry and empty the journal"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_file.with_name(self.manifest_file.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"metadata": metadata, "documents": self._manifest}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_file)
+        if self.manifest_journal.exists():
+            self.manifest_journal.unlink()
+    
+    def _written(self, docs):
+        # Drop live documents back to their files unless changed again since
+        with self._records_lock:
+            for doc in docs:
+                position = self._id_positions.get(doc["id"])
+                if position is not None and self._records[position] == doc:
+                    self._records[position] = doc["id"]
+
+class SqliteStore(DocumentStore):
+    """Documents in normalized SQLite tables, read and written on demand.
+    
+    URLs, languages and quotes get their own tables. Title, URL, canonical
+    key, type, date and language are indexed, so lookups never need the
+    corpus in memory. Reads use one connection. Batches are written, one
+    transaction each, on a second connection that the writer thread may
+    own. Documents changed but not yet written are held in an overlay that
+    find() checks, so lookups always see the latest version.
+    """
+    
+    # Columns of the documents table; any other fields round-trip through 'extra'
+    COLUMNS = ['id', 'title', 'url', 'type', 'date', 'language', 'description',
+               'read', 'comments', 'added_date']
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            url TEXT NOT NULL,
+            type TEXT,
+            date TEXT,
+            language TEXT,
+            description TEXT,
+            read INTEGER NOT NULL DEFAULT 0,
+            comments TEXT,
+            added_date TEXT,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS document_urls (
+            doc_seq INTEGER NOT NULL REFERENCES documents(seq) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (doc_seq, position)
+        );
+        CREATE TABLE IF NOT EXISTS document_languages (
+            doc_seq INTEGER NOT NULL REFERENCES documents(seq) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            PRIMARY KEY (doc_seq, position)
+        );
+        CREATE TABLE IF NOT EXISTS quotes (
+            doc_seq INTEGER NOT NULL REFERENCES documents(seq) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            quote TEXT NOT NULL,
+            PRIMARY KEY (doc_seq, position)
+        );
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_documents_title ON documents(title);
+        CREATE INDEX IF NOT EXISTS idx_documents_type ON documents(type);
+        CREATE INDEX IF NOT EXISTS idx_documents_date ON documents(date);
+        CREATE INDEX IF NOT EXISTS idx_documents_language ON documents(language);
+        CREATE INDEX IF NOT EXISTS idx_document_urls_url ON document_urls(url);
+        CREATE INDEX IF NOT EXISTS idx_document_urls_key ON document_urls(key);
+        CREATE INDEX IF NOT EXISTS idx_document_languages_language ON document_languages(language);
+    """
+    
+    def __init__(self, path, read_only=False):
+        super().__init__(path, read_only)
+        self.conn = None
+        self._write_conn = None
+        self._unwritten = {}  # id -> live document changed but not yet written
+        self._overlay_lock = threading.Lock()
+    
+    def load(self, default_metadata):
+        if self.read_only and self.path.exists():
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        elif self.read_only:
+            self.conn = sqlite3.connect(":memory:")  # Nothing stored yet
+            self.conn.executescript(self.SCHEMA)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.executescript(self.SCHEMA)
+        rows = self.conn.execute("SELECT key, value FROM metadata").fetchall()
+        self.metadata = dict(default_metadata)
+        self.metadata.update((key, json.loads(value)) for key, value in rows)
+        print(f"Loaded {self.count()} existing documents from {self.path}")
+    
+    def find(self, title, url):
+        # Earliest-stored match on URL or title, as the JSON store returns.
+        # Crawled URLs are canonical; older spellings still match on their key
+        url = canonical_url(url)
+        row = self.conn.execute("""
+            SELECT MIN(seq) FROM (
+                SELECT doc_seq AS seq FROM document_urls WHERE url = ?
+                UNION ALL
+                SELECT seq FROM documents WHERE title = ?
+            )""", (url, title)).fetchone()
+        doc = self._latest(row[0])
+        if doc is None:
+            doc = self._find_unwritten(
+                lambda d: url in map(canonical_url, d.get("urls", [d["url"]])) or d["title"] == title)
+        if doc is None:
+            row = self.conn.execute("SELECT MIN(doc_seq) FROM document_urls WHERE key = ?",
+                                    (document_key(url),)).fetchone()
+            doc = self._latest(row[0])
+        if doc is None:
+            key = document_key(url)
+            doc = self._find_unwritten(
+                lambda d: any(document_key(u) == key for u in d.get("urls", [d["url"]])))
+        return doc
+    
+    def _latest(self, seq):
+        """The stored document at seq, or its newer unwritten version"""
+        if seq is None:
+            return None
+        doc = self._load_document(seq)
+        with self._overlay_lock:
+            return self._unwritten.get(doc["id"], doc)
+    
+    def _find_unwritten(self, predicate):
+        with self._overlay_lock:
+            candidates = list(self._unwritten.values())
+        return next((doc for doc in candidates if predicate(doc)), None)
+    
+    def _load_document(self, seq, conn=None):
+        conn = conn or self.conn
+        row = conn.execute(
+            f"SELECT {', '.join(self.COLUMNS)}, extra FROM documents WHERE seq = ?", (seq,)).fetchone()
+        doc = dict(zip(self.COLUMNS, row[:-1]))
+        # Annotations now live in an AnnotationStore; rows saved before that
+        # still carry them until they are migrated out
+        if doc["read"]:
+            doc["read"] = True
+        else:
+            del doc["read"]
+        if not doc["comments"]:
+            del doc["comments"]
+        doc.update(json.loads(row[-1]) if row[-1] else {})
+        urls = [url for (url,) in conn.execute(
+            "SELECT url FROM document_urls WHERE doc_seq = ? ORDER BY position", (seq,))]
+        if len(urls) > 1:
+            doc["urls"] = urls
+        doc["languages"] = [language for (language,) in conn.execute(
+            "SELECT language FROM document_languages WHERE doc_seq = ? ORDER BY position", (seq,))]
+        quotes = [json.loads(quote) for (quote,) in conn.execute(
+            "SELECT quote FROM quotes WHERE doc_seq = ? ORDER BY position", (seq,))]
+        if quotes:
+            doc["quotes"] = quotes
+        return doc
+    
+    def add(self, doc):
+        if "id" not in doc:
+            base = document_id(doc["url"])
+            taken = {doc_id for (doc_id,) in self.conn.execute(
+                "SELECT id FROM documents WHERE id = ? OR id LIKE ?", (base, base + "-%"))}
+            with self._overlay_lock:
+                taken.update(doc_id for doc_id in self._unwritten if doc_id.startswith(base))
+            doc["id"] = unique_document_id(doc["url"], taken)
+        self._changed(doc)
+    
+    def update(self, doc):
+        self._changed(doc)
+    
+    def _changed(self, doc):
+        with self._overlay_lock:
+            self._unwritten[doc["id"]] = doc
+        super()._changed(doc)
+    
+    def _written(self, docs):
+        # Keep an overlay entry if the live document changed again after the
+        # snapshot was taken; its newer version is already queued
+        with self._overlay_lock:
+            for doc in docs:
+                if self._unwritten.get(doc["id"]) == doc:
+                    del self._unwritten[doc["id"]]
+    
+    def has(self, doc_id):
+        with self._overlay_lock:
+            if doc_id in self._unwritten:
+                return True
+        return self.conn.execute("SELECT 1 FROM documents WHERE id = ?", (doc_id,)).fetchone() is not None
+    
+    def count(self):
+        with self._overlay_lock:
+            unwritten = list(self._unwritten)
+        stored = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        if not unwritten:
+            return stored
+        placeholders = ', '.join('?' * len(unwritten))
+        known = self.conn.execute(
+            f"SELECT COUNT(*) FROM documents WHERE id IN ({placeholders})", unwritten).fetchone()[0]
+        return stored + len(unwritten) - known
+    
+    def documents(self):
+        seqs = [seq for (seq,) in self.conn.execute("SELECT seq FROM documents ORDER BY seq")]
+        return (self._latest(seq) for seq in seqs)
+    
+    def _write_batch(self, docs, metadata, compact=False):
+        """Upsert docs and metadata in one transaction"""
+        if self._write_conn is None:
+            self._write_conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn = self._write_conn
+        with conn:
+            for doc in docs:
+                self._write_document(conn, doc)
+            conn.executemany(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in metadata.items()])
+        if docs:
+            print(f"Committed {len(docs)} documents to {self.path}")
+        if compact:
+            conn.execute("PRAGMA optimize")
+    
+    def _write_document(self, conn, doc):
+        """Upsert a document and replace its child rows"""
+        values = [doc.get(column) for column in self.COLUMNS]
+        values[self.COLUMNS.index('read')] = int(bool(doc.get("read")))
+        extra = {key: value for key, value in doc.items()
+                 if key not in self.COLUMNS and key not in ('urls', 'languages', 'quotes')}
+        conn.execute(f"""
+            INSERT INTO documents ({', '.join(self.COLUMNS)}, extra)
+            VALUES ({', '.join('?' * (len(self.COLUMNS) + 1))})
+            ON CONFLICT(id) DO UPDATE SET
+            {', '.join(f'{column} = excluded.{column}' for column in self.COLUMNS[1:])},
+            extra = excluded.extra""", values + [json.dumps(extra, ensure_ascii=False) if extra else None])
+        seq = conn.execute("SELECT seq FROM documents WHERE id = ?", (doc["id"],)).fetchone()[0]
+        
+        urls = list(doc.get("urls", []))
+        if doc["url"] not in urls:
+            urls.append(doc["url"])
+        for table in ('document_urls', 'document_languages', 'quotes'):
+            conn.execute(f"DELETE FROM {table} WHERE doc_seq = ?", (seq,))
+        conn.executemany(
+            "INSERT INTO document_urls (doc_seq, position, url, key) VALUES (?, ?, ?, ?)",
+            [(seq, position, url, document_key(url)) for position, url in enumerate(urls)])
+        conn.executemany(
+            "INSERT INTO document_languages (doc_seq, position, language) VALUES (?, ?, ?)",
+            [(seq, position, language) for position, language in enumerate(doc.get("languages", []))])
+        conn.executemany(
+            "INSERT INTO quotes (doc_seq, position, quote) VALUES (?, ?, ?)",
+            [(seq, position, json.dumps(quote, ensure_ascii=False))
+             for position, quote in enumerate(doc.get("quotes", []))])
+    
+    def close(self):
+        super().close()
+        for conn in (self._write_conn, self.conn):
+            if conn:
+                conn.close()
+        self.conn = self._write_conn = None
+
+class PerPopeStore(DocumentStore):
+    """A separate store for each pontiff behind one DocumentStore.
+    
+    The spec names the stores with a {pope} placeholder, such as
+    sqlite:popes/{pope}.db, filled in with each POPES key. Documents go to
+    the store of the pontiff their URL belongs to, and lookups go to that
+    store alone. Each store keeps its own metadata, with its own 'pope' and
+    document count; everything else is copied from this store's by
+    sync_metadata(), which is called before each save.
+    `path` stands in for the whole set, with {pope} replaced by 'all'.
+    """
+    
+    def __init__(self, spec, popes, lazy=False, read_only=False):
+        scheme, _, path = spec.partition(':')
+        super().__init__((path if scheme in ('sqlite', 'dir', 'json') and path else spec).replace('{pope}', 'all'),
+                         read_only)
+        self.stores = {pope: open_document_store(spec.replace('{pope}', pope), lazy, read_only=read_only)
+                       for pope in popes}
+    
+    def load(self, default_metadata):
+        for pope, store in self.stores.items():
+            store.load(dict(default_metadata, pope=POPES[pope]))
+        self.metadata = dict(default_metadata)
+        self.metadata["annotations_migrated"] = all(
+            store.metadata.get("annotations_migrated") for store in self.stores.values())
+    
+    def _store_for(self, url):
+        return self.stores.get(pope_of(url))
+    
+    def find(self, title, url):
+        store = self._store_for(url)
+        return store.find(title, url) if store else None
+    
+    def add(self, doc):
+        self._store_for(doc["url"]).add(doc)
+    
+    def update(self, doc):
+        self._store_for(doc["url"]).update(doc)
+    
+    def has(self, doc_id):
+        return any(store.has(doc_id) for store in self.stores.values())
+    
+    def count(self):
+        return sum(store.count() for store in self.stores.values())
+    
+    def documents(self):
+        for store in self.stores.values():
+            yield from store.documents()
+    
+    def start_writer(self, **thresholds):
+        for store in self.stores.values():
+            store.start_writer(**thresholds)
+    
+    def _write_batch(self, docs, metadata, compact=False):
+        # Documents reach disk only through each pontiff's own store and writer
+        raise NotImplementedError("PerPopeStore writes through the store of each pontiff")
+    
+    def sync_metadata(self):
+        for pope, store in self.stores.items():
+            store.metadata.update({key: value for key, value in self.metadata.items()
+                                   if key not in ("pope", "total_documents")})
+            store.metadata["pope"] = POPES[pope]
+            store.metadata["total_documents"] = store.count()
+    
+    def save(self, compact=False):
+        # Only hands each store's metadata to its writer, so it is safe off the
+        # thread that owns the stores; sync_metadata() fills that in first
+        for store in self.stores.values():
+            store.save(compact)
+    
+    def close(self):
+        for store in self.stores.values():
+            store.close()
+
+class AnnotationStore:
+    """The reader's own notes on documents: read status, comments and quotes.
+    
+    Kept apart from the scraped corpus in a small JSON file keyed by
+    document ID, so a crawl never rewrites them and marking a document as
+    read never rewrites the corpus. Only annotated documents have an entry.
+    Every change re-reads the file if another process has changed it, then
+    atomically replaces it, so annotating is safe while a crawl is running.
+    """
+    
+    FIELDS = {"read": False, "comments": "", "quotes": []}
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.entries = {}
+        self._reload()
+    
+    @classmethod
+    def beside(cls, store):
+        """The annotation file kept next to a DocumentStore"""
+        return cls(store.path.with_name(store.path.stem + ".annotations.json"))
+    
+    def _reload(self):
+        """Re-read the file if it changed since it was last read"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+            self._mtime = mtime
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading annotations: {e}")
+    
+    def _save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.path)
+        self._mtime = self.path.stat().st_mtime_ns
+    
+    def _set(self, doc_id, fields):
+        """Merge fields into doc_id's entry, dropping any left at their default"""
+        entry = dict(self.entries.get(doc_id, {}), **fields)
+        entry = {field: value for field, value in entry.items() if value != self.FIELDS[field]}
+        if entry:
+            self.entries[doc_id] = entry
+        else:
+            self.entries.pop(doc_id, None)
+    
+    def get(self, doc_id):
+        """The annotations for doc_id, with defaults for fields never set"""
+        with self._lock:
+            self._reload()
+            annotation = dict(self.FIELDS, **self.entries.get(doc_id, {}))
+        annotation["quotes"] = list(annotation["quotes"])
+        return annotation
+    
+    def update(self, doc_id, **fields):
+        """Set read, comments and/or quotes for doc_id"""
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Not annotation fields: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self._reload()
+            self._set(doc_id, fields)
+            self._save()
+    
+    def add_quote(self, doc_id, quote):
+        with self._lock:
+            self._reload()
+            quotes = self.entries.get(doc_id, {}).get("quotes", [])
+            self._set(doc_id, {"quotes": quotes + [quote]})
+            self._save()
+    
+    def join(self, doc):
+        """A copy of doc with its annotations filled in"""
+        return dict(doc, **self.get(doc["id"]))
+    
+    def annotate(self, store, ref, **fields):
+        """Update the annotations of the document in store with this ID or URL.
+        
+        Returns the document's ID; raises ValueError if store has no such document.
+        """
+        doc_id = ref
+        if ref.startswith(('http://', 'https://')):
+            doc = store.find(None, ref)
+            if doc is None:
+                raise ValueError(f"No stored document has the URL {ref}")
+            doc_id = doc["id"]
+        elif not store.has(doc_id):
+            raise ValueError(f"No stored document has the ID {ref}")
+        if "quote" in fields:
+            self.add_quote(doc_id, fields.pop("quote"))
+        if fields:
+            self.update(doc_id, **fields)
+        return doc_id
+    
+    def export(self, store, path):
+        """Write the documents in store joined with their annotations as one JSON file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"metadata": store.metadata, "documents": [self.join(doc) for doc in store.documents()]},
+                      f, indent=2, ensure_ascii=False)
+        print(f"Exported {store.count()} annotated documents to {path}")
+    
+    def migrate(self, store):
+        """Move annotation fields out of the documents in store.
+        
+        Returns how many documents were rewritten without them. Values
+        already in this file win over those found in a document.
+        """
+        moved = []
+        with self._lock:
+            self._reload()
+            for doc in store.documents():
+                fields = {field: doc.pop(field) for field in self.FIELDS if field in doc}
+                if not fields:
+                    continue
+                found = {field: value for field, value in fields.items() if value is not None}
+                self._set(doc["id"], dict(found, **self.entries.get(doc["id"], {})))
+                moved.append(doc)
+            if moved:
+                self._save()
+        for doc in moved:
+            store.update(doc)
+        return len(moved)
+
+class BlobStore:
+    """Content-addressed store of document body texts.
+    
+    Each text is zlib-compressed into <hash[:2]>/<hash>.z, named by the
+    SHA-256 of the text itself, so a body reached through several URLs is
+    stored once and storing an unchanged body again costs nothing.
+    Documents only keep the hashes; texts are read when asked for.
+    """
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.stored = 0
+        self.duplicates = 0
+    
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.z"
+    
+    def put(self, text):
+        """Store text if it is new and return its hash"""
+        data = text.encode('utf-8')
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        if path.exists():
+            self.duplicates += 1
+            return key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(zlib.compress(data))
+        os.replace(tmp, path)
+        self.stored += 1
+        return key
+    
+    def get(self, key):
+        """The text stored under key, or None if it is missing"""
+        try:
+            return zlib.decompress(self._path(key).read_bytes()).decode('utf-8')
+        except (OSError, zlib.error):
+            return None
+
 class VaticanScraper:
-    def __init__(self, data_file="pope_leo_documents.json", delay=1.0):
-        self.data_file = Path(data_file)
-        self.delay = delay  # Delay between requests to be respectful
+    def __init__(self, data_file="pope_leo_documents.json", delay=1.0, concurrency=4, burst=1,
+                 cache_dir=None, cache_size=512 * 1024 * 1024, max_retries=4,
+                 breaker_threshold=5, breaker_cooldown=60.0, record=None, replay=None,
+                 queue_size=100, parse_workers=0, parser='lxml', show_timings=False,
+                 flush_interval=5.0, flush_documents=500, flush_bytes=4 * 1024 * 1024,
+                 lazy_load=False, capture_text=True, max_depth=3, section_priorities=(),
+                 incremental=False, freshness_days=None, use_sitemaps=True, sitemap_urls=(),
+                 popes=("leo-xiii",)):
+        # The pontiffs to crawl, as POPES keys
+        unknown = [pope for pope in popes if pope not in POPES]
+        if unknown:
+            raise ValueError(f"Unknown pope {unknown[0]!r}; choose from {', '.join(POPES)}")
+        self.popes = list(dict.fromkeys(popes))
+        # data_file is a JSON path or a store spec such as sqlite:path.db;
+        # a {pope} placeholder in it gives every pontiff a store of his own
+        self.store = open_document_store(data_file, lazy=lazy_load, popes=self.popes)
+        self.data_file = self.store.path
+        # Write-behind thresholds: whichever is reached first triggers a write
+        self.flush_interval = flush_interval
+        self.flush_documents = flush_documents
+        self.flush_bytes = flush_bytes
+        self.delay = delay  # Average seconds between requests to one host
+        self.concurrency = max(1, concurrency)  # Max requests in flight at once
+        self.queue_size = max(1, queue_size)  # Bound on queued pages and on results waiting for the store
+        self.parse_workers = max(0, parse_workers)  # Parser processes; 0 parses in fetch threads
+        self.parser = resolve_parser(parser)  # Tree builder used for every page
+        self.show_timings = show_timings  # Print each page's stage breakdown
+        # Navigation pages are followed at most this many links from the seeds;
+        # pages of the listed sections are crawled first, in that order
+        self.max_depth = max_depth
+        self.section_priorities = {section: rank for rank, section in enumerate(section_priorities)}
+        self._timings = {}
         self.base_url = "https://www.vatican.va"
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (compatible; Academic Research Bot)'
         })
+        # Size the connection pool so concurrent workers don't queue on it
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.concurrency,
+                                                pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Shared by all workers so the per-host budget holds at any concurrency
+        self.rate_limiter = RateLimiter(1.0 / delay if delay > 0 else None, burst)
+        
+        # Conditional-request cache; None disables it
+        self.cache = HttpCache(cache_dir, cache_size) if cache_dir else None
+        
+        # Transient failures are retried with backoff; hosts that keep failing
+        # are paused; URLs that never succeed are kept for a later run
+        self.max_retries = max_retries
+        self.backoff_base = 1.0
+        self.backoff_cap = 60.0
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.dead_letters = DeadLetterList(
+            self.data_file.with_name(self.data_file.stem + ".failed.json"))
+        
+        # When each page was last fetched; incremental crawls skip fresh ones
+        self.fetch_log = FetchLog(self.data_file.with_name(self.data_file.stem + ".fetched.jsonl"),
+                                  freshness_days)
+        self.incremental = incremental
+        
+        # robots.txt rules once read, and the sitemaps used to find documents
+        # instead of crawling index pages; lastmods maps their pages to when
+        # they last changed
+        self.robots = None
+        self.use_sitemaps = use_sitemaps
+        self.sitemap_urls = list(sitemap_urls)
+        self.lastmods = {}
+        
+        # Where the current crawl has got to, for --resume after an interruption
+        self.frontier = CrawlFrontier(self.data_file.with_name(self.data_file.stem + ".frontier.jsonl"))
+        
+        # WARC archive every response is written to, and one to serve pages
+        # from instead of the network
+        self.recorder = WarcWriter(record) if record else None
+        self.replay = WarcReader(replay) if replay else None
+        if self.replay:
+            print(f"Replaying {len(self.replay.index)} archived pages from {replay}")
         
         # Load existing data
-        self.documents = self.load_existing_data()
+        self.metadata = self.load_existing_data()
+        
+        # Read status, comments and quotes, kept out of the scraped corpus
+        self.annotations = AnnotationStore.beside(self.store)
+        if not self.metadata.get("annotations_migrated"):
+            self.migrate_annotations()
+        
+        # Full body texts, stored once per distinct text; None skips capturing them
+        self.blobs = BlobStore(self.data_file.with_name(self.data_file.stem + ".blobs")) if capture_text else None
         
     def load_existing_data(self):
         """Load existing document data, preserving user modifications"""
-        if self.data_file.exists():
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                print(f"Loaded {len(data.get('documents', []))} existing documents")
-                return data
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                print(f"Error loading existing data: {e}")
-                print("Starting with fresh data...")
-        
-        return {
-            "metadata": {
-                "last_updated": None,
-                "pope": "Leo XIII",
-                "source": "vatican.va",
-                "total_documents": 0
-            },
-            "documents": []
-        }
+        self.store.load({
+            "last_updated": None,
+            "pope": self.pope_names(),
+            "source": "vatican.va",
+            "total_documents": 0
+        })
+        return self.store.metadata
     
-    def save_data(self):
-        """Save document data to JSON file"""
-        self.documents["metadata"]["last_updated"] = datetime.now().isoformat()
-        self.documents["metadata"]["total_documents"] = len(self.documents["documents"])
-        
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.documents, f, indent=2, ensure_ascii=False)
+    def pope_names(self):
+        return ", ".join(POPES[pope] for pope in self.popes)
+    
+    def migrate_annotations(self):
+        """Move read status, comments and quotes from the store to the annotation file"""
+        moved = self.annotations.migrate(self.store)
+        self.metadata["annotations_migrated"] = True
+        if moved:
+            print(f"Moved read status, comments and quotes of {moved} documents to {self.annotations.path}")
+            self.save_data(compact=True)
+    
+    def document_text(self, doc, language=None):
+        """The stored body text of doc in language (default: its primary one), or None"""
+        hashes = doc.get("body_hashes", {})
+        key = hashes.get(language or doc.get("language"))
+        if key is None and language is None:
+            key = next(iter(hashes.values()), None)
+        return self.blobs.get(key) if key and self.blobs else None
+    
+    def annotated_documents(self):
+        """Every stored document joined with its annotations"""
+        return (self.annotations.join(doc) for doc in self.store.documents())
+    
+    def annotate(self, ref, **fields):
+        """Update the annotations of the document with this ID or URL"""
+        return self.annotations.annotate(self.store, ref, **fields)
+    
+    def export(self, path):
+        """Write the corpus joined with its annotations as one JSON file"""
+        self.annotations.export(self.store, path)
+    
+    def save_data(self, compact=False):
+        """Save document data to the store
         
-        print(f"Saved {len(self.documents['documents'])} documents to {self.data_file}")
+        compact asks the store to also tidy its on-disk form, e.g. fold the
+        JSON change journal into the snapshot.
+        """
+        self.metadata["last_updated"] = datetime.now().isoformat()
+        self.metadata["pope"] = self.pope_names()
+        self.metadata["total_documents"] = self.store.count()
+        self.store.sync_metadata()
+        self.store.save(compact)
+        if self.cache:
+            self.cache.save()
+        self.dead_letters.save()
+        self.fetch_log.save()
     
     def document_exists(self, title, url):
-        """Check if document already exists in our data"""
-        for doc in self.documents["documents"]:
-            if doc["title"] == title or doc["url"] == url:
-                return doc
-        return None
+        """Check if document already exists in our data
+        
+        Matches on any of the document's URLs or its title, and failing
+        those on the canonical key, so a translation joins its original.
+        A title shared with another pontiff's document is not a match.
+        """
+        existing = self.store.find(title, url)
+        pope = pope_of(url)
+        if existing and existing.get("pope", pope) != pope:
+            existing = self.store.find(None, url)
+        return existing
+    
+    def add_or_update_document(self, title, url, doc_type="", date="", language="", description="",
+                               body_hash=""):
+        """Add new document or update existing one while preserving user data
+        
+        body_hash names the page's body text in the blob store; a document
+        keeps one per language in 'body_hashes'. 'pope' records whose
+        document it is, so one store can hold several pontiffs' documents.
+        """
+        document, _ = self._add_or_update(title, url, doc_type, date, language, description, body_hash)
+        return document
     
-    def add_or_update_document(self, title, url, doc_type="", date="", language="", description=""):
-        """Add new document or update existing one while preserving user data"""
+    def _add_or_update(self, title, url, doc_type="", date="", language="", description="",
+                       body_hash=""):
+        """add_or_update_document, also returning whether the document is new"""
         existing = self.document_exists(title, url)
         
         if existing:
+            changed = False
             # Update URL if it's new/different (e.g., English translation added)
-            if url not in existing.get("urls", [existing["url"]]):
+            if canonical_url(url) not in map(canonical_url, existing.get("urls", [existing["url"]])):
                 if "urls" not in existing:
                     existing["urls"] = [existing["url"]]
                 existing["urls"].append(url)
                 existing["url"] = url  # Update primary URL
+                changed = True
                 print(f"Updated URLs for: {title}")
             
+            # Documents stored before popes were recorded
+            if "pope" not in existing and pope_of(url):
+                existing["pope"] = pope_of(url)
+                changed = True
+            
             # Update other metadata if provided
             if doc_type and not existing.get("type"):
                 existing["type"] = doc_type
+                changed = True
             if date and not existing.get("date"):
                 existing["date"] = date
+                changed = True
             if language and language not in existing.get("languages", []):
                 if "languages" not in existing:
                     existing["languages"] = [language]
                 else:
                     existing["languages"].append(language)
+                changed = True
             if description and not existing.get("description"):
                 existing["description"] = description
-                
-            return existing
+                changed = True
+            if body_hash and existing.get("body_hashes", {}).get(language) != body_hash:
+                existing["body_hashes"] = dict(existing.get("body_hashes", {}), **{language: body_hash})
+                changed = True
+            
+            if changed:
+                self.store.update(existing)
+            return existing, False
         else:
             # Create new document
             new_doc = {
                 "title": title,
                 "url": url,
+                "pope": pope_of(url),
                 "type": doc_type,
                 "date": date,
                 "language": language,
                 "languages": [language] if language else [],
                 "description": description,
-                "read": False,
-                "comments": "",
-                "quotes": [],
+                "body_hashes": {language: body_hash} if body_hash else {},
                 "added_date": datetime.now().isoformat()
             }
             
-            self.documents["documents"].append(new_doc)
+            self.store.add(new_doc)
             print(f"Added new document: {title}")
-            return new_doc
+            return new_doc, True
     
-    def fetch_page(self, url):
-        """Fetch a webpage with error handling and rate limiting"""
-        try:
-            time.sleep(self.delay)
+    def fetch_content(self, url, rate_limited=True, kind="document"):
+        """Fetch a page's raw bytes, retrying transient failures.
+        
+        Returns None once retries are exhausted or the error is permanent;
+        the url is then added to the dead-letter list under `kind`.
+        """
+        if self.replay:
+            return self._replay_content(url)
+        
+        error = None
+        for attempt in range(self.max_retries + 1):
+            pause = self.breaker.wait_time(url)
+            if pause:
+                time.sleep(pause)
+            if rate_limited or attempt:
+                self.rate_limiter.acquire(url)
+            try:
+                content = self._request(url)
+            except requests.RequestException as e:
+                error = e
+                retry_after = self._retry_delay(e, attempt)
+                if retry_after is None:
+                    break
+                self.breaker.record_failure(url)
+                if attempt == self.max_retries:
+                    break
+                print(f"Retrying {url} in {retry_after:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(retry_after)
+            else:
+                self.breaker.record_success(url)
+                self.dead_letters.discard(url)
+                return content
+        
+        print(f"Error fetching {url}: {error}")
+        self.dead_letters.add(url, error, kind)
+        return None
+    
+    def _replay_content(self, url):
+        """Serve a page from the replay archive; no network, no delay"""
+        archived = self.replay.get(url)
+        if archived is None:
+            print(f"Not in replay archive: {url}")
+            return None
+        status, content = archived
+        if status >= 400:
+            print(f"Error fetching {url}: archived HTTP {status}")
+            return None
+        return content
+    
+    def _request(self, url):
+        """Make a single GET for url through the cache, raising on failure"""
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+        response = self.session.get(url, timeout=30, headers=headers)
+        if response.status_code == 304:
+            content = self.cache.not_modified(url)
+            if content is not None:
+                if self.recorder:
+                    self.recorder.record_resource(url, content)
+                return content
+            # Evicted since the validators were read; fetch it whole
             response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
-        except requests.RequestException as e:
-            print(f"Error fetching {url}: {e}")
+        if self.recorder:
+            self.recorder.record_response(url, response)
+        response.raise_for_status()
+        if self.cache:
+            self.cache.put(url, response.content, response.headers)
+        return response.content
+    
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying after error, or None if it is permanent.
+        
+        Timeouts, connection errors, 429 and 5xx responses are transient.
+        A Retry-After header is honoured. Otherwise the delay is exponential
+        backoff with full jitter.
+        """
+        if isinstance(error, requests.HTTPError):
+            response = error.response
+            status = response.status_code if response is not None else 0
+            if status != 429 and status < 500:
+                return None
+            retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.backoff_cap * 5)
+        elif not isinstance(error, (requests.Timeout, requests.ConnectionError)):
             return None
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
     
-    def find_pope_leo_pages(self):
-        """Find all pages related to Pope Leo XIII on vatican.va"""
-        # Known starting points for Pope Leo XIII documents
-        search_urls = [
-            # Encyclicals
-            f"{self.base_url}/content/leo-xiii/en/encyclicals.index.html",
-            f"{self.base_url}/content/leo-xiii/la/encyclicals.index.html",
-            f"{self.base_url}/content/leo-xiii/it/encyclicals.index.html",
-            
-            # Letters
-            f"{self.base_url}/content/leo-xiii/en/letters.index.html",
-            f"{self.base_url}/content/leo-xiii/la/letters.index.html",
-            
-            # Speeches
-            f"{self.base_url}/content/leo-xiii/en/speeches.index.html",
-            f"{self.base_url}/content/leo-xiii/la/speeches.index.html",
-            
-            # Main page
-            f"{self.base_url}/content/leo-xiii/en.html",
-            f"{self.base_url}/content/leo-xiii/la.html",
-            f"{self.base_url}/content/leo-xiii/it.html",
-        ]
+    @staticmethod
+    def _parse_retry_after(value):
+        """Parse a Retry-After header given as seconds or as an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    
+    def read_robots(self):
+        """Fetch robots.txt, apply its Crawl-delay and return the sitemaps it lists"""
+        url = f"{self.base_url}/robots.txt"
+        content = self.fetch_content(url, kind="robots")
+        self.dead_letters.discard(url)  # A site without robots.txt is fine
+        self.robots = RobotFileParser(url)
+        self.robots.parse(content.decode('utf-8', 'replace').splitlines() if content else [])
         
-        all_document_links = set()
+        delay = self.robots.crawl_delay(self.session.headers['User-Agent'])
+        if delay:
+            host = urlparse(self.base_url).netloc.lower()
+            rate = 1.0 / float(delay)
+            if not self.rate_limiter.rate or rate < self.rate_limiter.rate:
+                self.rate_limiter.set_host_rate(host, rate)
+                print(f"robots.txt asks for {delay}s between requests; rate limiting {host} to match")
+        return self.robots.site_maps() or []
+    
+    def allowed(self, url):
+        """Whether robots.txt lets us fetch url (always, before it is read)"""
+        return self.robots is None or self.robots.can_fetch(self.session.headers['User-Agent'], url)
+    
+    def find_sitemap_pages(self, sitemap_urls):
+        """Read the sitemaps for the document pages of the popes crawled.
         
-        for url in search_urls:
-            print(f"Checking: {url}")
-            soup = self.fetch_page(url)
-            if not soup:
+        Returns {canonical url: lastmod timestamp or None}. Sitemap indexes
+        are followed; when some of their sitemaps name one of the popes,
+        only those are read. Navigation pages listed are left out, as the
+        sitemap already names the documents they link to.
+        """
+        pages = {}
+        pending = list(dict.fromkeys(sitemap_urls))
+        for sitemap_url in pending:  # Grows as sitemap indexes are read
+            print(f"Reading sitemap: {sitemap_url}")
+            content = self.fetch_content(sitemap_url, kind="sitemap")
+            if content is None:
                 continue
+            nested = []
+            try:
+                for kind, loc, lastmod in harvest_sitemap([content]):
+                    if kind == 'sitemap':
+                        nested.append(loc)
+                    elif (is_document_link(loc, sitemap_url) and pope_of(loc) in self.popes
+                          and not is_navigation_page(loc)):
+                        pages[canonical_url(loc)] = parse_lastmod(lastmod)
+            except ElementTree.ParseError as e:
+                print(f"Error parsing sitemap {sitemap_url}: {e}")
+            ours = [loc for loc in nested if names_pope(loc, self.popes)]
+            pending.extend(loc for loc in ours or nested if loc not in pending)
+        print(f"Sitemaps list {len(pages)} document pages from {len(pending)} sitemaps")
+        return pages
+    
+    def seed_urls(self, popes=None):
+        """Known starting points for the documents of each pope crawled (or of popes)"""
+        seeds = []
+        for pope in self.popes if popes is None else popes:
+            content = f"{self.base_url}/content/{pope}"
+            seeds += [
+                # Encyclicals
+                f"{content}/en/encyclicals.index.html",
+                f"{content}/la/encyclicals.index.html",
+                f"{content}/it/encyclicals.index.html",
                 
-            # Look for document links
-            links = soup.find_all('a', href=True)
-            for link in links:
-                href = link['href']
+                # Letters
+                f"{content}/en/letters.index.html",
+                f"{content}/la/letters.index.html",
                 
-                # Convert relative URLs to absolute
-                full_url = urljoin(url, href)
+                # Speeches
+                f"{content}/en/speeches.index.html",
+                f"{content}/la/speeches.index.html",
                 
-                # Filter for Leo XIII document pages
-                if (('/leo-xiii/' in full_url or '/leo_xiii/' in full_url) and 
-                    full_url.endswith('.html') and
-                    '/index.html' not in full_url and
-                    full_url != url):
-                    all_document_links.add(full_url)
+                # Main page
+                f"{content}/en.html",
+                f"{content}/la.html",
+                f"{content}/it.html",
+            ]
+        return seeds
+    
+    def find_pope_leo_pages(self, search_urls=None):
+        """Find all pages of the popes crawled on vatican.va
+        
+        Navigation pages linked from the search pages are followed
+        breadth-first, up to max_depth links away. Links to other
+        pontiffs' pages are ignored.
+        """
+        if search_urls is None:
+            search_urls = self.seed_urls()
+        
+        all_document_links = []
+        seen = set(map(canonical_url, search_urls))
+        pending = [(url, 0) for url in search_urls]
+        for url, depth in pending:  # Grows as navigation pages are found
+            print(f"Checking: {url}")
+            for link in map(canonical_url, self.find_page_links(url)):
+                if link in seen or pope_of(link) not in self.popes:
+                    continue
+                seen.add(link)
+                if not is_navigation_page(link):
+                    all_document_links.append(link)
+                elif depth < self.max_depth:
+                    pending.append((link, depth + 1))
         
-        return list(all_document_links)
+        return all_document_links
     
-    def extract_document_info(self, url):
+    def find_page_links(self, url, rate_limited=True):
+        """Fetch an index page and return the document links on it"""
+        content = self.fetch_content(url, rate_limited, kind="index")
+        if content is None:
+            return []
+        return parse_page_links(content, url)
+    
+    def extract_document_info(self, url, rate_limited=True):
         """Extract document information from a Vatican page"""
-        soup = self.fetch_page(url)
-        if not soup:
+        content = self.fetch_content(url, rate_limited)
+        if content is None:
             return None
+        return parse_document(content, url, self.parser, self.blobs is not None)
+    
+    async def _crawl_async(self, seed_urls, document_urls=(), skip=()):
+        """Crawl outward from the seed pages as one pipeline.
         
-        # Try to extract title
-        title = ""
-        title_selectors = [
-            'h1', 'h2.doc_title', '.doc_title', '.title', 
-            'title', 'h2', '.content h1', '.content h2'
-        ]
+        Pages wait in a priority queue ordered by _page_priority: documents
+        before navigation pages, so results start flowing at once, then by
+        section and depth. Workers take the most urgent page. A navigation
+        page has its links harvested and queued one hop deeper, following
+        further navigation pages only up to `max_depth`. A document is
+        extracted and its result pushed onto a bounded queue, which a
+        single consumer folds into the store; a full results queue makes
+        the workers wait. Seed pages and documents wait to join the page
+        queue while it holds `queue_size` pages. Workers queue the links
+        they find without waiting, which cannot deadlock them; since a
+        worker only takes a navigation page once no documents are queued,
+        that adds at most one page's links per worker. At most `concurrency` requests are in flight.
+        Network I/O runs on a thread pool and hands raw bytes to the parse
+        pool (worker processes when `parse_workers` is set), so parsing
+        never holds the GIL the fetchers need. The store is only ever
+        touched from the event loop thread.
         
-        for selector in title_selectors:
-            element = soup.select_one(selector)
-            if element and element.get_text().strip():
-                title = element.get_text().strip()
-                break
+        Every URL's progress is recorded in the frontier. URLs in skip were
+        already done by an interrupted run and are not revisited. Index
+        pages go into the fetch log only once the whole crawl completes.
+        """
+        loop = asyncio.get_running_loop()
+        pages = asyncio.PriorityQueue()
+        room = asyncio.Condition()  # Notified as pages leave the queue
+        results = asyncio.Queue(maxsize=self.queue_size)
+        seen = {canonical_url(url) for url in skip}
+        spellings = set()  # Every form of a link met so far, to count folded variants
+        fetched_indexes = []  # (url, when) of index pages fetched; fresh once the crawl completes
+        frontier = self.frontier
         
-        if not title:
-            title = urlparse(url).path.split('/')[-1].replace('.html', '').replace('-', ' ').title()
-        
-        # Clean up title
-        title = re.sub(r'\s+', ' ', title).strip()
-        
-        # Extract document type from URL or content
-        doc_type = "Unknown"
-        if '/encyclicals/' in url:
-            doc_type = "Encyclical"
-        elif '/letters/' in url:
-            doc_type = "Letter"
-        elif '/speeches/' in url:
-            doc_type = "Speech"
-        elif '/apost_letters/' in url:
-            doc_type = "Apostolic Letter"
-        
-        # Extract language from URL
-        language = "Latin"  # Default for Leo XIII era
-        if '/en/' in url:
-            language = "English"
-        elif '/it/' in url:
-            language = "Italian"
-        elif '/fr/' in url:
-            language = "French"
-        elif '/de/' in url:
-            language = "German"
-        elif '/es/' in url:
-            language = "Spanish"
-        
-        # Try to extract date
-        date = ""
-        date_patterns = [
-            r'(\d{1,2})\s+(\w+)\s+(\d{4})',  # 15 May 1891
-            r'(\d{4})-(\d{2})-(\d{2})',      # 1891-05-15
-            r'(\w+)\s+(\d{1,2}),\s+(\d{4})', # May 15, 1891
-        ]
+        async def fetch(url, kind, timings=None):
+            # Queue for the rate limit here so waiting doesn't pin a thread
+            started = time.perf_counter()
+            if not self.replay:
+                await self.rate_limiter.acquire_async(url)
+            queued = time.perf_counter()
+            content = await loop.run_in_executor(
+                executor, partial(self.fetch_content, url, rate_limited=False, kind=kind))
+            if timings is not None:
+                timings['queue'] = queued - started
+                timings['fetch'] = time.perf_counter() - queued
+            return content
         
-        text_content = soup.get_text()
-        for pattern in date_patterns:
-            match = re.search(pattern, text_content)
-            if match:
-                date = match.group(0)
-                break
+        async def parse(func, content, *args):
+            if content is None:
+                return None
+            return await loop.run_in_executor(parser_pool, func, content, *args)
         
-        # Try to get description from first paragraph
-        description = ""
-        first_p = soup.select_one('p')
-        if first_p:
-            desc_text = first_p.get_text().strip()
-            if len(desc_text) > 50:
-                description = desc_text[:200] + "..." if len(desc_text) > 200 else desc_text
-        
-        return {
-            'title': title,
-            'url': url,
-            'type': doc_type,
-            'date': date,
-            'language': language,
-            'description': description
-        }
-    
-    def scrape_all_documents(self):
-        """Main scraping function"""
-        print("Starting Vatican website scrape for Pope Leo XIII documents...")
-        
-        # Find all document pages
-        document_urls = self.find_pope_leo_pages()
-        print(f"Found {len(document_urls)} potential document pages")
-        
-        processed = 0
-        new_docs = 0
-        updated_docs = 0
-        
-        for url in document_urls:
-            print(f"Processing ({processed + 1}/{len(document_urls)}): {url}")
-            
-            doc_info = self.extract_document_info(url)
-            if doc_info:
-                existing = self.document_exists(doc_info['title'], doc_info['url'])
-                if existing:
-                    self.add_or_update_document(**doc_info)
-                    updated_docs += 1
-                else:
-                    self.add_or_update_document(**doc_info)
-                    new_docs += 1
-            
-            processed += 1
-            
-            # Save periodically
-            if processed % 10 == 0:
-                self.save_data()
+        def enqueue(link, kind, depth):
+            url = canonical_url(link)
+            if pope_of(url) not in self.popes:
+                return  # Another pontiff's page
+            if link not in spellings:
+                spellings.add(link)
+                if url in seen and link != url:
+                    self._stats['duplicates'] += 1  # A variant spelling we would have fetched again
+            if url not in seen:
+                seen.add(url)
+                if not self.allowed(url):
+                    self._stats['disallowed'] += 1
+                    return
+                if self.incremental and self.fetch_log.is_fresh(url, self.lastmods.get(url)):
+                    self._stats['fresh'] += 1
+                    return
+                if kind == "document":
+                    self._stats['discovered'] += 1
+                frontier.add(url, kind, depth)
+                pages.put_nowait((self._page_priority(url, kind, depth), len(seen), url, kind, depth))
+        
+        async def discover(url, depth):
+            print(f"Checking: {url}")
+            frontier.mark(url, "index", frontier.IN_FLIGHT)
+            fetched = time.time()
+            content = await fetch(url, "index")
+            if content is not None:
+                fetched_indexes.append((url, fetched))
+            for link in await parse(parse_page_links, content, url) or []:
+                if not is_navigation_page(link):
+                    enqueue(link, "document", depth + 1)
+                elif depth < self.max_depth:
+                    enqueue(link, "index", depth + 1)
+            frontier.mark(url, "index", frontier.DONE if content is not None else frontier.FAILED)
+        
+        async def extract(url):
+            frontier.mark(url, "document", frontier.IN_FLIGHT)
+            timings = {}
+            content = await fetch(url, "document", timings)
+            parsed = await parse(parse_document_timed, content, url, self.parser,
+                                 self.blobs is not None)
+            doc_info = None
+            if parsed:
+                doc_info, parse_timings = parsed
+                timings.update(parse_timings)
+            await results.put((url, doc_info, timings))
+        
+        async def work():
+            while True:
+                _, _, url, kind, depth = await pages.get()
+                async with room:
+                    room.notify()
+                if url is None:
+                    return
+                try:
+                    if kind == "index":
+                        await discover(url, depth)
+                    else:
+                        await extract(url)
+                finally:
+                    pages.task_done()
+        
+        async def seed(url, kind):
+            async with room:
+                await room.wait_for(lambda: pages.qsize() < self.queue_size)
+            enqueue(url, kind, frontier.depth(url, kind))
         
-        # Final save
-        self.save_data()
+        async def produce():
+            for url in seed_urls:
+                await seed(url, "index")
+            for url in document_urls:
+                await seed(url, "document")
+            await pages.join()
+            print(f"Found {self._stats['discovered']} potential document pages")
+            print(f"Canonical URLs prevented {self._stats['duplicates']} duplicate fetches")
+            if self.incremental:
+                print(f"Skipped {self._stats['fresh']} pages fetched within their freshness TTL")
+            if self._stats['disallowed']:
+                print(f"Skipped {self._stats['disallowed']} pages robots.txt disallows")
+            for _ in range(self.concurrency):
+                pages.put_nowait(((float('inf'),), 0, None, None, None))
+        
+        async def consume():
+            loop = asyncio.get_running_loop()
+            while (result := await results.get()) is not None:
+                self._record_result(*result)
+                if time.monotonic() - self._last_side_save >= self.flush_interval:
+                    self._last_side_save = time.monotonic()
+                    # Taken here, so only what was recorded before the store flush is saved
+                    progress = (self.fetch_log.take(), self.frontier.take())
+                    self.store.sync_metadata()  # Reads the store, so not on the executor thread
+                    await loop.run_in_executor(None, self._save_progress, *progress)
+        
+        async def finish():
+            await asyncio.gather(*workers)
+            await results.put(None)
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            parser_pool = (ProcessPoolExecutor(max_workers=self.parse_workers)
+                           if self.parse_workers else executor)
+            try:
+                workers = [asyncio.ensure_future(work()) for _ in range(self.concurrency)]
+                await asyncio.gather(produce(), finish(), consume())
+                # Only now are the documents an index page links to all done,
+                # so an interrupted crawl revisits its index pages
+                for url, fetched in fetched_indexes:
+                    self.fetch_log.record(url, "index", fetched)
+            finally:
+                if parser_pool is not executor:
+                    parser_pool.shutdown()
+    
+    def _page_priority(self, url, kind, depth):
+        """Sort key for the crawl queue: documents first, then the sections
+        in section_priorities in the order given, then shallower pages"""
+        section = self.section_priorities.get(page_section(url), len(self.section_priorities))
+        return (0 if kind == "document" else 1, section, depth)
+    
+    def _record_result(self, url, doc_info, timings=None):
+        """Fold one extraction result into the store"""
+        stats = self._stats
+        print(f"Processed ({stats['processed'] + 1}): {url}")
+        if timings:
+            for stage, seconds in timings.items():
+                self._timings[stage] = self._timings.get(stage, 0.0) + seconds
+            self._timings['pages'] = self._timings.get('pages', 0) + 1
+            if self.show_timings:
+                print("  " + ", ".join(f"{stage} {seconds * 1000:.1f}ms"
+                                       for stage, seconds in timings.items()))
+        if doc_info:
+            if stats['first_document'] is None:
+                stats['first_document'] = time.monotonic() - stats['started']
+            doc_info = dict(doc_info)
+            doc_info['doc_type'] = doc_info.pop('type', '')
+            body = doc_info.pop('body', None)
+            if body and self.blobs:
+                doc_info['body_hash'] = self.blobs.put(body)
+            _, created = self._add_or_update(**doc_info)
+            stats['new' if created else 'updated'] += 1
+        
+        stats['processed'] += 1
+        if doc_info:
+            self.fetch_log.record(url, doc_info['doc_type'])
+        self.frontier.mark(url, "document", self.frontier.DONE if doc_info else self.frontier.FAILED)
+    
+    def _save_progress(self, fetched, frontier_changes):
+        """Save the side files, off the event loop.
+        
+        Documents are written behind by the store's writer thread; the
+        small cache index, dead-letter list, fetch log and frontier are
+        saved now and then. The store is flushed first so no URL is
+        recorded as done or fresh before its document is durable; fetched
+        and frontier_changes are what was recorded before the flush.
+        """
+        if self.cache:
+            self.cache.save()
+        self.dead_letters.save()
+        self.store.save()
+        self.fetch_log.save(fetched)
+        self.frontier.flush(frontier_changes)
+    
+    def timing_summary(self):
+        """Average per-page time spent in each stage of the pipeline"""
+        pages = self._timings.get('pages', 0)
+        if not pages:
+            return "Per-page timings: no pages"
+        stages = ", ".join(f"{stage} {self._timings[stage] / pages * 1000:.1f}ms"
+                           for stage in ('queue', 'fetch', 'parse', 'extract') if stage in self._timings)
+        return f"Per-page timings (avg over {pages}): {stages}"
+    
+    def scrape_all_documents(self, retry_failed_only=False, resume=False):
+        """Main scraping function
+        
+        Documents are found from the sitemaps robots.txt lists, and by
+        crawling out from the seed index pages for each pope the sitemaps
+        list nothing for.
+        With retry_failed_only, skip normal discovery and retry only the
+        URLs left in the dead-letter list by earlier runs. With resume,
+        continue an interrupted crawl from its frontier: only the index
+        pages and documents it had not finished are visited.
+        """
+        print(f"Starting Vatican website scrape for {self.pope_names()} documents...")
+        sitemap_urls = self.read_robots() + self.sitemap_urls
+        
+        # Earlier failures are always retried along with the new work
+        failed_documents = self.dead_letters.urls("document")
+        document_urls = failed_documents
+        done = []
+        if resume and not retry_failed_only and self.frontier.load():
+            frontier = self.frontier
+            seed_urls = frontier.urls("index", frontier.PENDING)
+            pending = frontier.urls("document", frontier.PENDING)
+            done = frontier.urls("document", frontier.DONE)
+            document_urls = pending + failed_documents
+            print(f"Resuming an interrupted crawl: {len(seed_urls)} index pages and "
+                  f"{len(pending)} documents left, {len(done)} documents already done")
+            done += frontier.urls("index", frontier.DONE)
+        else:
+            if resume:
+                print("No interrupted crawl to resume; starting from the beginning")
+            if retry_failed_only:
+                seed_urls = self.dead_letters.urls("index")
+                print(f"Retrying {len(seed_urls)} index pages and "
+                      f"{len(failed_documents)} documents from earlier runs")
+            else:
+                seed_urls = self.seed_urls()
+                if self.use_sitemaps and sitemap_urls:
+                    self.lastmods = self.find_sitemap_pages(sitemap_urls)
+                    if self.lastmods:
+                        # The sitemaps name these popes' documents; only crawl the index pages of the rest
+                        listed = {pope_of(url) for url in self.lastmods}
+                        unlisted = [pope for pope in self.popes if pope not in listed]
+                        if unlisted:
+                            print(f"Sitemaps list nothing for {', '.join(unlisted)}; crawling their index pages")
+                        seed_urls = self.seed_urls(unlisted)
+                        document_urls = document_urls + list(self.lastmods)
+            self.frontier.reset()
+            for url in seed_urls:
+                self.frontier.add(url, "index", 0)
+        
+        self._stats = {'processed': 0, 'new': 0, 'updated': 0, 'discovered': 0,
+                       'duplicates': 0, 'fresh': 0, 'disallowed': 0,
+                       'started': time.monotonic(), 'first_document': None}
+        self._timings = {}
+        self._last_side_save = time.monotonic()
+        self.store.start_writer(max_interval=self.flush_interval,
+                                max_documents=self.flush_documents,
+                                max_bytes=self.flush_bytes)
+        try:
+            asyncio.run(self._crawl_async(seed_urls, document_urls, done))
+        except KeyboardInterrupt:
+            print("\nInterrupted; writing pending changes before exiting...")
+            self.save_data()
+            self.store.close()
+            self.frontier.flush()
+            print("Run again with --resume to continue where this crawl stopped")
+            raise
+        processed = self._stats['processed']
+        new_docs = self._stats['new']
+        updated_docs = self._stats['updated']
+        
+        # Final save folds the journal into the snapshot
+        self.save_data(compact=True)
+        self.frontier.finish()
+        if self.recorder:
+            self.recorder.close()
+            print(f"Recorded {self.recorder.records} responses to {self.recorder.path}")
         
         print(f"\nScraping completed!")
         print(f"Total documents processed: {processed}")
         print(f"New documents added: {new_docs}")
         print(f"Documents updated: {updated_docs}")
-        print(f"Total documents in database: {len(self.documents['documents'])}")
+        print(f"Total documents in database: {self.store.count()}")
+        if self._stats['first_document'] is not None:
+            print(f"First document stored after {self._stats['first_document']:.1f}s")
+        print(self.timing_summary())
+        print(self.rate_limiter.summary())
+        if self.dead_letters.entries:
+            print(f"{len(self.dead_letters.entries)} URLs failed; see {self.dead_letters.path} "
+                  f"(rerun with --retry-failed to retry only those)")
+        if self.cache:
+            print(self.cache.summary())
+        if self.blobs:
+            print(f"Body texts: {self.blobs.stored} stored, {self.blobs.duplicates} already stored")
+        self.store.close()
 
 def main():
-    parser = argparse.ArgumentParser(description="Scrape Vatican website for Pope Leo XIII documents")
+    parser = argparse.ArgumentParser(description="Scrape Vatican website for papal documents")
+    parser.add_argument("--pope", metavar="POPE", action="append", choices=list(POPES) + ["all"],
+                       help="Pontiff to crawl, by vatican.va path name (e.g. pius-x, john-paul-ii); "
+                            "repeat for several, or 'all' for every modern pope (default: leo-xiii)")
     parser.add_argument("--output", "-o", default="pope_leo_documents.json", 
-                       help="Output JSON file (default: pope_leo_documents.json)")
+                       help="Output file; the extension picks the format: .json, .json.gz, .json.zst, "
+                            ".msgpack or .msgpack.zst. A {pope} placeholder keeps a separate store "
+                            "per pope (default: pope_leo_documents.json)")
+    parser.add_argument("--store",
+                       help="Document store instead of --output: sqlite:PATH.db, dir:PATH or json:PATH.json; "
+                            "{pope} in PATH keeps a separate store per pope")
+    parser.add_argument("--lazy-load", action="store_true",
+                       help="Index the JSON store at startup and read documents from disk on demand")
     parser.add_argument("--delay", "-d", type=float, default=1.0,
-                       help="Delay between requests in seconds (default: 1.0)")
+                       help="Average seconds between requests to the same host (default: 1.0)")
+    parser.add_argument("--burst", type=int, default=1,
+                       help="Requests a host may receive back-to-back before --delay applies (default: 1)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4,
+                       help="Maximum requests in flight at once (default: 4)")
+    parser.add_argument("--flush-interval", type=float, default=5.0,
+                       help="Write changed documents at least this often, in seconds (default: 5)")
+    parser.add_argument("--flush-docs", type=int, default=500,
+                       help="Write once this many changed documents are waiting (default: 500)")
+    parser.add_argument("--flush-mib", type=float, default=4.0,
+                       help="Write once about this much changed data is waiting, in MiB (default: 4)")
+    parser.add_argument("--max-depth", type=int, default=3,
+                       help="Follow navigation pages at most this many links from the seed pages (default: 3)")
+    parser.add_argument("--prioritize", metavar="SECTION", action="append", default=[],
+                       help="Crawl this section (e.g. encyclicals) first; repeat to give an order")
+    parser.add_argument("--queue-size", type=int, default=100,
+                       help="Bound on pages waiting to be crawled and on extracted documents "
+                            "waiting to be stored (default: 100)")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                       help="Processes for HTML parsing; 0 parses in the fetch threads "
+                            "(default: number of CPUs)")
+    parser.add_argument("--parser", default="lxml", choices=PARSER_BACKENDS,
+                       help="HTML parser backend; falls back to lxml, then html.parser, "
+                            "if the library is missing (default: lxml)")
+    parser.add_argument("--no-text", action="store_true",
+                       help="Don't store each document's full body text")
+    parser.add_argument("--timings", action="store_true",
+                       help="Print a queue/fetch/parse/extract time breakdown for every page")
+    parser.add_argument("--cache-dir", default=".http_cache",
+                       help="Directory for the conditional-request HTTP cache (default: .http_cache)")
+    parser.add_argument("--cache-size", type=int, default=512,
+                       help="Maximum size of cached page bodies in MiB (default: 512)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Disable the HTTP cache")
+    parser.add_argument("--retries", type=int, default=4,
+                       help="Retries for timeouts, 429 and 5xx responses (default: 4)")
+    parser.add_argument("--no-sitemaps", action="store_true",
+                       help="Find documents by crawling index pages even when robots.txt lists sitemaps")
+    parser.add_argument("--sitemap", metavar="URL", action="append", default=[],
+                       help="Also read this sitemap or sitemap index; repeatable")
+    parser.add_argument("--incremental", action="store_true",
+                       help="Skip pages fetched more recently than their type's freshness TTL, "
+                            "or than their sitemap lastmod")
+    parser.add_argument("--ttl", metavar="TYPE=DAYS", action="append", default=[],
+                       help="Freshness TTL for a document type, 'index' or 'default' "
+                            "(e.g. Encyclical=365); repeatable")
+    restart = parser.add_mutually_exclusive_group()
+    restart.add_argument("--retry-failed", action="store_true",
+                       help="Only retry URLs that failed in earlier runs")
+    restart.add_argument("--resume", action="store_true",
+                       help="Continue an interrupted crawl instead of starting over")
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument("--record", metavar="WARC",
+                       help="Append every fetched response to this WARC file (.warc.gz to compress)")
+    archive.add_argument("--replay", metavar="WARC",
+                       help="Serve pages from a recorded WARC file instead of the network")
+    
+    notes = parser.add_argument_group("annotations", "Edit or export annotations instead of crawling")
+    notes.add_argument("--mark-read", metavar="DOC", action="append", default=[],
+                       help="Mark the document with this ID or URL as read")
+    notes.add_argument("--mark-unread", metavar="DOC", action="append", default=[],
+                       help="Mark the document with this ID or URL as unread")
+    notes.add_argument("--comment", nargs=2, metavar=("DOC", "TEXT"), action="append", default=[],
+                       help="Set the comments on a document")
+    notes.add_argument("--add-quote", nargs=2, metavar=("DOC", "TEXT"), action="append", default=[],
+                       help="Add a quote to a document")
+    notes.add_argument("--export", metavar="PATH",
+                       help="Write every document joined with its annotations to PATH")
     
     args = parser.parse_args()
+    freshness_days = {}
+    for ttl in args.ttl:
+        doc_type, _, days = ttl.rpartition('=')
+        try:
+            freshness_days[doc_type] = float(days)
+        except ValueError:
+            parser.error(f"--ttl expects TYPE=DAYS, got {ttl!r}")
+    popes = list(POPES) if "all" in (args.pope or []) else args.pope or ["leo-xiii"]
+    
+    edits = ([(ref, {"read": True}) for ref in args.mark_read] +
+             [(ref, {"read": False}) for ref in args.mark_unread] +
+             [(ref, {"comments": text}) for ref, text in args.comment] +
+             [(ref, {"quote": text}) for ref, text in args.add_quote])
+    if edits or args.export:
+        # Only the annotation file is written; the corpus is opened just to look documents up
+        spec = args.store or args.output
+        store = open_document_store(spec, lazy=args.lazy_load, popes=popes, read_only=True)
+        store.load({})
+        if store.count() and not store.metadata.get("annotations_migrated"):
+            # A corpus from before annotations had their own file is migrated once
+            store = open_document_store(spec, lazy=args.lazy_load, popes=popes)
+            store.load({})
+            moved = AnnotationStore.beside(store).migrate(store)
+            store.metadata["annotations_migrated"] = True
+            store.sync_metadata()
+            store.save(compact=True)
+            store.close()
+            print(f"Moved read status, comments and quotes of {moved} documents out of {store.path}")
+            store = open_document_store(spec, lazy=args.lazy_load, popes=popes, read_only=True)
+            store.load({})
+        annotations = AnnotationStore.beside(store)
+        for ref, fields in edits:
+            try:
+                print(f"Annotated {annotations.annotate(store, ref, **fields)}")
+            except ValueError as e:
+                parser.error(str(e))
+        if args.export:
+            annotations.export(store, args.export)
+        return
     
-    scraper = VaticanScraper(data_file=args.output, delay=args.delay)
-    scraper.scrape_all_documents()
+    scraper = VaticanScraper(data_file=args.store or args.output, delay=args.delay,
+                             concurrency=args.concurrency, burst=args.burst,
+                             cache_dir=None if args.no_cache else args.cache_dir,
+                             cache_size=args.cache_size * 1024 * 1024,
+                             max_retries=args.retries, record=args.record, replay=args.replay,
+                             queue_size=args.queue_size, parse_workers=args.parse_workers,
+                             parser=args.parser, show_timings=args.timings,
+                             flush_interval=args.flush_interval, flush_documents=args.flush_docs,
+                             flush_bytes=int(args.flush_mib * 1024 * 1024),
+                             lazy_load=args.lazy_load, capture_text=not args.no_text,
+                             max_depth=args.max_depth, section_priorities=args.prioritize,
+                             incremental=args.incremental, freshness_days=freshness_days,
+                             use_sitemaps=not args.no_sitemaps, sitemap_urls=args.sitemap,
+                             popes=popes)
+    scraper.scrape_all_documents(retry_failed_only=args.retry_failed, resume=args.resume)
 
 if __name__ == "__main__":
     main()